@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class ApiConfig(AppConfig):
     """ Настройка конфигураций приложения api."""
     name = 'api'
+
+    def ready(self):
+        from . import signals  # noqa: F401
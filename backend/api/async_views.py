@@ -0,0 +1,65 @@
+""" Асинхронные обёртки view для запуска под ASGI."""
+
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from django.urls import URLPattern
+
+from .db import reset_health_checks
+from .metrics import count_queries
+
+executor = None
+
+
+def run_view(view, request, *args, **kwargs):
+    """ Выполняет синхронный view целиком в потоке пула.
+
+    Ответ рендерится здесь же, а потоковый ответ вычитывается заранее:
+    ASGI-обработчик Django 3.2 перебирает его в цикле событий, где
+    запросы к базе запрещены. Отдача медленному клиенту после этого
+    не занимает ни поток, ни воркер.
+    """
+    close_old_connections()
+    reset_health_checks()
+    counter = getattr(request, '_metrics_counter', None)
+    try:
+        with count_queries(counter) if counter else nullcontext():
+            response = view(request, *args, **kwargs)
+            if hasattr(response, 'render') and callable(response.render):
+                response.render()
+            if response.streaming:
+                response.streaming_content = list(response.streaming_content)
+    finally:
+        close_old_connections()
+    return response
+
+
+def async_view(view):
+    """ Асинхронный view, выполняющий view в ограниченном пуле потоков."""
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        global executor
+        if executor is None:
+            # Не больше соединений с базой, чем потоков в пуле.
+            executor = ThreadPoolExecutor(
+                max_workers=settings.ASYNC_VIEW_THREADS,
+                thread_name_prefix='async-view')
+        return await sync_to_async(
+            run_view, thread_sensitive=False, executor=executor
+        )(view, request, *args, **kwargs)
+    return wrapper
+
+
+def async_patterns(patterns, names):
+    """ Заменяет view маршрутов с именами из names на асинхронные."""
+    return [
+        URLPattern(pattern.pattern, async_view(pattern.callback),
+                   pattern.default_args, pattern.name)
+        if isinstance(pattern, URLPattern) and pattern.name in names
+        else pattern
+        for pattern in patterns
+    ]
@@ -0,0 +1,110 @@
+""" Аутентификация по токену с кэшем пользователей."""
+
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+
+def shared_key(key):
+    return f'auth:token:{key}'
+
+
+class TokenCache:
+    """ LRU токенов в памяти процесса с коротким TTL.
+
+    Если задан TOKEN_CACHE_ALIAS, промахи сначала ищутся в общем кэше,
+    чтобы процессы gunicorn не ходили в базу за одним и тем же токеном.
+    """
+
+    def __init__(self):
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.stats = {'local_hits': 0, 'shared_hits': 0, 'misses': 0}
+
+    @staticmethod
+    def get_shared():
+        alias = settings.TOKEN_CACHE_ALIAS
+        return caches[alias] if alias else None
+
+    def get(self, key):
+        now = time.monotonic()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] > now:
+                self.entries.move_to_end(key)
+                self.stats['local_hits'] += 1
+                return entry[1]
+            self.entries.pop(key, None)
+        shared = self.get_shared()
+        value = shared.get(shared_key(key)) if shared else None
+        if value is not None:
+            self.store_local(key, value)
+            self.stats['shared_hits'] += 1
+            return value
+        self.stats['misses'] += 1
+        return None
+
+    def set(self, key, value):
+        self.store_local(key, value)
+        shared = self.get_shared()
+        if shared:
+            shared.set(shared_key(key), value, settings.TOKEN_CACHE_TTL)
+
+    def store_local(self, key, value):
+        with self.lock:
+            self.entries[key] = (
+                time.monotonic() + settings.TOKEN_CACHE_TTL, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > settings.TOKEN_CACHE_SIZE:
+                self.entries.popitem(last=False)
+
+    def invalidate(self, keys):
+        with self.lock:
+            for key in keys:
+                self.entries.pop(key, None)
+        shared = self.get_shared()
+        if shared:
+            shared.delete_many([shared_key(key) for key in keys])
+
+    def invalidate_user(self, user_id):
+        """ Сбрасывает все токены пользователя."""
+        with self.lock:
+            keys = {
+                key for key, (_, (user, _)) in self.entries.items()
+                if user.pk == user_id
+            }
+        if self.get_shared():
+            keys.update(Token.objects.filter(
+                user_id=user_id).values_list('key', flat=True))
+        self.invalidate(keys)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+token_cache = TokenCache()
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """ TokenAuthentication, который не ходит в базу за горячими токенами.
+
+    Кэш сбрасывается при удалении токена (logout в djoser), сохранении
+    пользователя (смена пароля, деактивация) и через TOKEN_CACHE_TTL
+    секунд в остальных процессах.
+    """
+
+    def authenticate_credentials(self, key):
+        cached = token_cache.get(key)
+        if cached is not None:
+            user, token = cached
+            return copy.copy(user), token
+        user, token = super().authenticate_credentials(key)
+        token_cache.set(key, (user, token))
+        return copy.copy(user), token
@@ -0,0 +1,164 @@
+""" Кэширование справочников и условные GET-запросы к рецептам."""
+
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.utils.cache import (get_conditional_response, patch_cache_control,
+                                patch_vary_headers)
+from django.utils.http import http_date, quote_etag
+from rest_framework.generics import get_object_or_404
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+
+from .replicas import use_primary
+
+
+def get_catalog_cache():
+    """ Возвращает кэш, в котором хранятся справочники."""
+    return caches[settings.CATALOG_CACHE_ALIAS]
+
+
+def version_key(model):
+    return f'catalog:{model._meta.label_lower}:version'
+
+
+def get_catalog_version(model):
+    """ Версия справочника, она же время его последнего изменения."""
+    return get_catalog_cache().get_or_set(
+        version_key(model), time.time, settings.CATALOG_CACHE_TIMEOUT)
+
+
+def invalidate_catalog(model):
+    """ Сбрасывает закэшированные ответы справочника."""
+    get_catalog_cache().set(
+        version_key(model), time.time(), settings.CATALOG_CACHE_TIMEOUT)
+
+
+class CatalogCacheMixin:
+    """ Отдаёт готовый JSON справочника из кэша с поддержкой 304."""
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(
+            super().retrieve, request, *args, **kwargs)
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        if request.accepted_renderer.format != 'json':
+            return handler(request, *args, **kwargs)
+        cache = get_catalog_cache()
+        model = self.get_queryset().model
+        version = get_catalog_version(model)
+        path = hashlib.md5(request.get_full_path().encode()).hexdigest()
+        key = f'catalog:{model._meta.label_lower}:{version}:{path}'
+        entry = cache.get(key)
+        if entry is None:
+            # Справочник изменился недавно, и реплика могла ещё не догнать
+            # основную базу: устаревший ответ попал бы в кэш.
+            with use_primary(
+                    time.time() - version < settings.REPLICA_PIN_SECONDS):
+                response = handler(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+            content = JSONRenderer().render(response.data)
+            entry = (content, hashlib.md5(content).hexdigest())
+            cache.set(key, entry, settings.CATALOG_CACHE_TIMEOUT)
+        content, etag = entry
+        etag = quote_etag(etag)
+        last_modified = int(version)
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = HttpResponse(
+                content, content_type='application/json')
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        return response
+
+
+def rows_etag(rows, *parts):
+    """ Сильный ETag по значениям полей, без сериализации ответа."""
+    digest = hashlib.md5()
+    for item in (*parts, *rows):
+        digest.update(repr(item).encode())
+    return quote_etag(digest.hexdigest())
+
+
+def paginator_count(paginator):
+    """ Поле count ответа для обеих пагинаций рецептов."""
+    if hasattr(paginator, 'count'):
+        return paginator.count
+    return paginator.page.paginator.count
+
+
+class ConditionalGetMixin:
+    """ Отвечает 304 на If-None-Match до сериализации.
+
+    Страница выбирается один раз из etag_queryset(queryset) без
+    prefetch: по ней считается ETag, и её же объекты сериализуются
+    после prefetch_page, если ответ нужен. В ETag входят count и
+    ссылка на следующую страницу, поэтому он меняется и при изменениях
+    за пределами страницы. Анонимные ответы можно кэшировать в nginx.
+    """
+    etag_catalogs = ()
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.etag_queryset(
+            self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(queryset)
+        if page is None:
+            objects = list(queryset)
+            return self.conditional_response(
+                request, objects, (),
+                lambda: Response(self.serialize(objects)))
+        parts = (paginator_count(self.paginator),
+                 self.paginator.get_next_link())
+        return self.conditional_response(
+            request, page, parts,
+            lambda: self.get_paginated_response(self.serialize(page)))
+
+    def retrieve(self, request, *args, **kwargs):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        instance = get_object_or_404(
+            self.etag_queryset(self.filter_queryset(self.get_queryset())),
+            **{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+        self.check_object_permissions(request, instance)
+        return self.conditional_response(
+            request, [instance], (),
+            lambda: Response(self.serialize([instance])[0]))
+
+    def etag_queryset(self, queryset):
+        raise NotImplementedError
+
+    def etag_values(self, instance):
+        """ Поля объекта, от которых зависит ответ."""
+        raise NotImplementedError
+
+    def prefetch_page(self, objects):
+        """ Подгружает связи, нужные сериализатору."""
+
+    def serialize(self, objects):
+        self.prefetch_page(objects)
+        return self.get_serializer(objects, many=True).data
+
+    def conditional_response(self, request, objects, parts, respond):
+        etag = rows_etag(
+            (self.etag_values(instance) for instance in objects),
+            request.user.pk, *parts,
+            *(get_catalog_version(model) for model in self.etag_catalogs))
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = respond()
+        if response.status_code in (200, 304):
+            response['ETag'] = etag
+        if request.user.is_authenticated:
+            patch_cache_control(response, private=True, no_cache=True)
+        else:
+            patch_cache_control(
+                response, public=True, max_age=settings.RECIPES_CACHE_MAX_AGE)
+        patch_vary_headers(response, ('Authorization',))
+        return response
@@ -0,0 +1,44 @@
+""" Постоянные соединения с базой и их проверка."""
+
+from django.db import connections
+
+
+def close_if_unusable(connection):
+    """ Закрывает постоянное соединение, которое база уже оборвала."""
+    connection.health_check_done = True
+    if (connection.connection is not None
+            and not connection.in_atomic_block
+            and not connection.is_usable()):
+        connection.close()
+
+
+def checked_ensure_connection(connection):
+    """ ensure_connection, который сначала проверяет соединение."""
+    ensure_connection = connection.ensure_connection
+
+    def wrapper():
+        if not connection.health_check_done:
+            close_if_unusable(connection)
+        ensure_connection()
+
+    return wrapper
+
+
+def reset_health_checks():
+    """ Откладывает проверку соединений до первого обращения к базе.
+
+    Django 3.2 проверяет соединение перед повторным использованием,
+    только если в нём была ошибка. Соединение, закрытое Postgres или
+    pgbouncer во время простоя, иначе дало бы ошибку 500 на первом
+    запросе. Настройка CONN_HEALTH_CHECKS повторяет поведение Django 4.1:
+    в начале запроса соединение только помечается, а SELECT 1 выполняется
+    при первом курсоре, поэтому запросы без базы и неиспользуемые базы
+    ничего не стоят.
+    """
+    for connection in connections.all():
+        if not connection.settings_dict.get('CONN_HEALTH_CHECKS'):
+            continue
+        if not hasattr(connection, 'health_check_done'):
+            connection.ensure_connection = checked_ensure_connection(
+                connection)
+        connection.health_check_done = connection.connection is None
@@ -1,16 +1,65 @@
 """ Кодирования и декодирования изображение."""
 
 import base64
+import binascii
+import tempfile
 
-from django.core.files.base import ContentFile
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
 from rest_framework import serializers
 
+# Размер куска base64, кратный 4, чтобы каждый кусок декодировался отдельно.
+DECODE_CHUNK_SIZE = 64 * 1024
+SPOOL_MAX_SIZE = 1024 * 1024
+
 
 class Base64ImageField(serializers.ImageField):
     """ Настройка кодирования и декодирования изображений."""
+    default_error_messages = {
+        'too_large': 'Размер изображения не должен превышать {max_size} МБ.',
+        'invalid_base64': 'Изображение повреждено.',
+    }
+
     def to_internal_value(self, data):
         if isinstance(data, str) and data.startswith('data:image'):
             format, imgstr = data.split(';base64,')
             ext = format.split('/')[-1]
-            data = ContentFile(base64.b64decode(imgstr), name='temp.' + ext)
+            data = self.decode(imgstr, name='temp.' + ext)
         return super().to_internal_value(data)
+
+    def decode(self, imgstr, name):
+        """ Декодирует base64 по частям во временный файл."""
+        max_size = settings.MAX_IMAGE_UPLOAD_SIZE
+        # Клиенты могут переносить base64 по строкам, как в MIME.
+        imgstr = ''.join(imgstr.split())
+        if len(imgstr) // 4 * 3 > max_size + 3:
+            self.fail('too_large', max_size=max_size // (1024 * 1024))
+        file = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+        size = 0
+        try:
+            for start in range(0, len(imgstr), DECODE_CHUNK_SIZE):
+                chunk = base64.b64decode(
+                    imgstr[start:start + DECODE_CHUNK_SIZE], validate=True)
+                size += len(chunk)
+                if size > max_size:
+                    file.close()
+                    self.fail(
+                        'too_large', max_size=max_size // (1024 * 1024))
+                file.write(chunk)
+        except binascii.Error:
+            file.close()
+            self.fail('invalid_base64')
+        file.seek(0)
+        return UploadedFile(file, name=name, size=size)
+
+
+class RenditionImageField(serializers.ImageField):
+    """ Отдаёт уменьшенную версию изображения, пока её нет — оригинал."""
+    def __init__(self, rendition, **kwargs):
+        self.rendition = rendition
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def get_attribute(self, instance):
+        rendition = getattr(instance, self.rendition)
+        return rendition if rendition else instance.image
@@ -2,6 +2,7 @@
 
 from django_filters.rest_framework import FilterSet, filters
 from recipes.models import Ingredients, Recipes, Tags
+from recipes.search import search_recipes
 
 
 class IngredientsFilter(FilterSet):
@@ -24,17 +25,26 @@ class RecipesFilter(FilterSet):
     is_favorited = filters.NumberFilter(method='filter_is_favorited')
     is_in_shopping_cart = filters.NumberFilter(
         method='filter_is_in_shopping_cart')
+    search = filters.CharFilter(method='filter_search')
 
     class Meta:
         model = Recipes
-        fields = ('tags', 'author', 'is_favorited', 'is_in_shopping_cart',)
+        fields = (
+            'tags', 'author', 'is_favorited', 'is_in_shopping_cart', 'search',
+        )
 
     def filter_is_favorited(self, queryset, name, value):
         if value and self.request.user.is_authenticated:
-            return queryset.filter(favorite_recipes__user=self.request.user)
+            return queryset.filter(is_favorited=True)
         return queryset
 
     def filter_is_in_shopping_cart(self, queryset, name, value):
         if value and self.request.user.is_authenticated:
-            return queryset.filter(shopping_cart__user=self.request.user)
+            return queryset.filter(is_in_shopping_cart=True)
+        return queryset
+
+    def filter_search(self, queryset, name, value):
+        """ Полнотекстовый поиск, самые подходящие рецепты первыми."""
+        if value.strip():
+            return search_recipes(queryset, value.strip())
         return queryset
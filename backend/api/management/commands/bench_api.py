@@ -0,0 +1,256 @@
+''' Нагрузочный замер основных эндпоинтов API.'''
+
+import json
+import random
+import statistics
+import time
+from io import StringIO
+
+import django
+from api.matching import invalidate_matcher, recipes_matcher
+from django.contrib.auth.hashers import make_password
+from django.core.management import BaseCommand, call_command
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from recipes.counters import rebuild_counters
+from recipes.feed import rebuild_feed
+from recipes.management.commands.import_db import batches
+from recipes.models import (FavoriteResipes, Ingredients, IngredientsRecipes,
+                            Recipes, ShoppingCart, Tags)
+from recipes.search import update_search_vectors
+from rest_framework.authtoken.models import Token
+from users.models import Subscriptions, User
+
+PREFIX = 'bench_api_'
+BATCH_SIZE = 5000
+TAGS = (
+    ('Завтрак', 'breakfast', '#E26C2D'),
+    ('Обед', 'lunch', '#49B64E'),
+    ('Ужин', 'dinner', '#8775D2'),
+    ('Десерт', 'dessert', '#F0C808'),
+)
+PERCENTILES = (50, 90, 95, 99)
+
+
+def percentile(values, percent):
+    """ Перцентиль отсортированного списка с линейной интерполяцией.
+
+    statistics.quantiles появился только в Python 3.8, а образ
+    backend собран на 3.7.
+    """
+    position = (len(values) - 1) * percent / 100
+    lower = int(position)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет базу реалистичным набором данных и замеряет задержки '
+        'и число SQL-запросов основных эндпоинтов. Результат — JSON. '
+        'Данные откатываются, если не указан --keep.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=2000)
+        parser.add_argument('--recipes', type=int, default=100_000)
+        parser.add_argument('--ingredients-per-recipe', type=int, default=8)
+        parser.add_argument('--favorites-per-user', type=int, default=50)
+        parser.add_argument('--carts-per-user', type=int, default=10)
+        parser.add_argument('--subscriptions-per-user', type=int, default=20)
+        parser.add_argument(
+            '--iterations', type=int, default=50,
+            help='Сколько запросов делать к каждому эндпоинту.')
+        parser.add_argument(
+            '--seed', type=int, default=0,
+            help='Зерно генератора, чтобы наборы совпадали между запусками.')
+        parser.add_argument(
+            '--label', default='',
+            help='Метка запуска в JSON, например хеш коммита.')
+        parser.add_argument(
+            '--output', default='-',
+            help='Файл для JSON, по умолчанию stdout.')
+        parser.add_argument(
+            '--keep', action='store_true',
+            help='Не откатывать созданные данные.')
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options['seed'])
+        if not Ingredients.objects.exists():
+            call_command('import_db', stdout=StringIO())
+        with transaction.atomic():
+            start = time.perf_counter()
+            dataset = self.seed(options)
+            seeding = time.perf_counter() - start
+            report = {
+                'label': options['label'],
+                'database': connection.vendor,
+                'django': django.get_version(),
+                'dataset': dataset,
+                'seed_seconds': round(seeding, 2),
+                'iterations': options['iterations'],
+                'endpoints': self.measure(options['iterations']),
+            }
+            transaction.set_rollback(not options['keep'])
+        invalidate_matcher()
+        output = json.dumps(report, ensure_ascii=False, indent=2)
+        if options['output'] == '-':
+            self.stdout.write(output)
+        else:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                file.write(output)
+
+    def seed(self, options):
+        """ Создаёт пользователей, рецепты и связи пачками."""
+        password = make_password('bench-password')
+        self.bulk(User, (
+            User(username=f'{PREFIX}{index}',
+                 email=f'{PREFIX}{index}@example.com',
+                 first_name='Пользователь', last_name=str(index),
+                 password=password)
+            for index in range(options['users'])
+        ))
+        self.users = list(User.objects.filter(
+            username__startswith=PREFIX).values_list('id', flat=True))
+        Tags.objects.bulk_create(
+            (Tags(name=name, slug=slug, color=color)
+             for name, slug, color in TAGS),
+            ignore_conflicts=True,
+        )
+        self.tags = list(Tags.objects.values_list('id', 'slug'))
+        self.ingredients = list(
+            Ingredients.objects.values_list('id', 'name'))
+        self.bulk(Recipes, (
+            Recipes(author_id=self.random.choice(self.users),
+                    name=f'{PREFIX}рецепт {index}',
+                    text='Описание рецепта', image='',
+                    cooking_time=self.random.randint(1, 180))
+            for index in range(options['recipes'])
+        ))
+        self.recipes = list(Recipes.objects.filter(
+            author_id__in=self.users).values_list('id', flat=True))
+        tags_through = Recipes.tags.through
+        self.bulk(tags_through, (
+            tags_through(recipes_id=recipe, tags_id=tag)
+            for recipe in self.recipes
+            for tag, _ in self.random.sample(
+                self.tags, self.random.randint(1, 2))
+        ))
+        per_recipe = min(
+            options['ingredients_per_recipe'], len(self.ingredients))
+        self.bulk(IngredientsRecipes, (
+            IngredientsRecipes(recipes_id=recipe, ingredients_id=ingredient,
+                               amount=self.random.randint(1, 500))
+            for recipe in self.recipes
+            for ingredient, _ in self.random.sample(
+                self.ingredients, per_recipe)
+        ))
+        self.bulk(FavoriteResipes, self.relations(
+            FavoriteResipes, 'recipes_id', self.recipes,
+            options['favorites_per_user']))
+        self.bulk(ShoppingCart, self.relations(
+            ShoppingCart, 'recipes_id', self.recipes,
+            options['carts_per_user']))
+        self.bulk(Subscriptions, self.relations(
+            Subscriptions, 'author_id', self.users,
+            options['subscriptions_per_user']))
+        rebuild_counters()
+        rebuild_feed()
+        update_search_vectors()
+        invalidate_matcher()
+        recipes_matcher.refresh()
+        return {
+            'users': len(self.users),
+            'recipes': len(self.recipes),
+            'ingredients': len(self.ingredients),
+            'favorites': FavoriteResipes.objects.count(),
+            'shopping_cart': ShoppingCart.objects.count(),
+            'subscriptions': Subscriptions.objects.count(),
+        }
+
+    def relations(self, model, field, targets, per_user):
+        for user in self.users:
+            for target in self.random.sample(
+                    targets, min(per_user, len(targets))):
+                if field == 'author_id' and target == user:
+                    continue
+                yield model(user_id=user, **{field: target})
+
+    @staticmethod
+    def bulk(model, objects):
+        """ bulk_create пачками, не собирая все объекты в памяти."""
+        for batch in batches(objects, BATCH_SIZE):
+            model.objects.bulk_create(batch, ignore_conflicts=True)
+
+    def scenarios(self):
+        """ Эндпоинт и функция, возвращающая URL очередного запроса."""
+        pages = max(len(self.recipes) // 6, 1)
+        return {
+            'recipes_list': lambda: (
+                f'/api/recipes/?page={self.random.randint(1, min(pages, 50))}'
+            ),
+            'recipes_list_cursor': lambda: '/api/recipes/?cursor=&limit=6',
+            'recipes_detail': lambda: (
+                f'/api/recipes/{self.random.choice(self.recipes)}/'),
+            'recipes_filtered': lambda: (
+                f'/api/recipes/?tags={self.random.choice(self.tags)[1]}'
+                f'&is_favorited=1'),
+            'recipes_by_author': lambda: (
+                f'/api/recipes/?author={self.random.choice(self.users)}'),
+            'recipes_search': lambda: (
+                '/api/recipes/?search='
+                + self.random.choice(self.ingredients)[1].split()[0]),
+            'ingredients_search': lambda: (
+                '/api/ingredients/?name='
+                + self.random.choice(self.ingredients)[1][
+                    :self.random.randint(1, 4)]),
+            'feed': lambda: '/api/recipes/feed/',
+            'recipes_cookable': lambda: (
+                '/api/recipes/cookable/?ingredients=' + ','.join(
+                    str(pk) for pk, _ in self.random.sample(
+                        self.ingredients, 10))),
+            'subscriptions': lambda: (
+                '/api/users/subscriptions/?recipes_limit=3'),
+            'download_shopping_cart': lambda: (
+                '/api/recipes/download_shopping_cart/?format=txt'),
+        }
+
+    def measure(self, iterations):
+        results = {}
+        for name, make_url in self.scenarios().items():
+            timings, queries = [], []
+            for _ in range(iterations):
+                client = self.client_for(self.random.choice(self.users))
+                url = make_url()
+                # Журнал запросов при DEBUG ограничен, и при переполнении
+                # CaptureQueriesContext считает неверно.
+                connection.queries_log.clear()
+                with CaptureQueriesContext(connection) as context:
+                    start = time.perf_counter()
+                    response = client.get(url)
+                    if response.streaming:
+                        b''.join(response.streaming_content)
+                    timings.append(time.perf_counter() - start)
+                if response.status_code != 200:
+                    raise RuntimeError(
+                        f'{url}: статус {response.status_code}')
+                queries.append(len(context))
+            results[name] = self.summary(timings, queries)
+        return results
+
+    @staticmethod
+    def client_for(user_id):
+        token, _ = Token.objects.get_or_create(user_id=user_id)
+        return Client(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+    @staticmethod
+    def summary(timings, queries):
+        timings = sorted(timings)
+        return {
+            **{f'p{percent}_ms': round(percentile(timings, percent) * 1000, 2)
+               for percent in PERCENTILES},
+            'mean_ms': round(statistics.mean(timings) * 1000, 2),
+            'queries_min': min(queries),
+            'queries_max': max(queries),
+        }
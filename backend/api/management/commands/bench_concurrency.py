@@ -0,0 +1,152 @@
+''' Нагрузочный замер запущенного сервера: пропускная способность и хвосты.'''
+
+import http.client
+import json
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote, urlsplit
+
+from api.management.commands.bench_api import percentile
+from django.core.management import BaseCommand
+
+PATHS = (
+    '/api/tags/',
+    '/api/ingredients/?name=мо',
+    '/api/recipes/',
+    '/api/recipes/?limit=24',
+)
+PERCENTILES = (50, 90, 99)
+# Символы URL, которые не нужно экранировать.
+SAFE = "/?&=,:%"
+
+
+class Command(BaseCommand):
+    help = (
+        'Шлёт параллельные запросы к уже запущенному серверу, в том числе '
+        'на фоне медленных клиентов, и выводит JSON с перцентилями. '
+        'Запускается против gunicorn с sync-воркерами и с воркерами '
+        'uvicorn (foodgram.asgi), чтобы сравнить режимы.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--base-url', default='http://127.0.0.1:8000')
+        parser.add_argument('--paths', nargs='+', default=PATHS)
+        parser.add_argument(
+            '--token', default='',
+            help='Токен для заголовка Authorization.')
+        parser.add_argument('--concurrency', type=int, default=32)
+        parser.add_argument(
+            '--requests', type=int, default=1000,
+            help='Сколько запросов сделать всего.')
+        parser.add_argument(
+            '--slow-clients', type=int, default=0,
+            help='Сколько медленных клиентов держать открытыми.')
+        parser.add_argument(
+            '--slow-path', default='/api/recipes/download_shopping_cart/',
+            help='Что запрашивают медленные клиенты.')
+        parser.add_argument(
+            '--slow-delay', type=float, default=0.5,
+            help='Пауза медленного клиента между байтами, секунд.')
+        parser.add_argument('--label', default='')
+        parser.add_argument('--output', default='-')
+
+    def handle(self, *args, **options):
+        url = urlsplit(options['base_url'])
+        self.host, self.port = url.hostname, url.port or 80
+        self.headers = (
+            {'Authorization': f'Token {options["token"]}'}
+            if options['token'] else {})
+        stop = threading.Event()
+        slow = [
+            threading.Thread(
+                target=self.slow_client, daemon=True,
+                args=(options['slow_path'], options['slow_delay'], stop))
+            for _ in range(options['slow_clients'])
+        ]
+        for thread in slow:
+            thread.start()
+        time.sleep(options['slow_delay'] * 2 if slow else 0)
+        paths = [
+            options['paths'][index % len(options['paths'])]
+            for index in range(options['requests'])
+        ]
+        start = time.perf_counter()
+        with ThreadPoolExecutor(options['concurrency']) as pool:
+            results = list(pool.map(self.request, paths))
+        elapsed = time.perf_counter() - start
+        stop.set()
+        report = {
+            'label': options['label'],
+            'base_url': options['base_url'],
+            'concurrency': options['concurrency'],
+            'slow_clients': options['slow_clients'],
+            'requests': len(results),
+            'errors': sum(1 for _, status, _ in results if status != 200),
+            'requests_per_second': round(len(results) / elapsed, 1),
+            'latency': self.summary([latency for _, _, latency in results]),
+            'paths': {
+                path: self.summary([
+                    latency for result_path, _, latency in results
+                    if result_path == path
+                ])
+                for path in options['paths']
+            },
+        }
+        output = json.dumps(report, ensure_ascii=False, indent=2)
+        if options['output'] == '-':
+            self.stdout.write(output)
+        else:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                file.write(output)
+
+    def request(self, path):
+        connection = http.client.HTTPConnection(
+            self.host, self.port, timeout=60)
+        start = time.perf_counter()
+        try:
+            connection.request(
+                'GET', quote(path, safe=SAFE), headers=self.headers)
+            response = connection.getresponse()
+            response.read()
+            status = response.status
+        except (OSError, http.client.HTTPException):
+            status = 0
+        finally:
+            connection.close()
+        return path, status, time.perf_counter() - start
+
+    def slow_client(self, path, delay, stop):
+        """ Отправляет запрос по байту и так же медленно читает ответ."""
+        headers = ''.join(
+            f'{name}: {value}\r\n' for name, value in self.headers.items())
+        data = (
+            f'GET {quote(path, safe=SAFE)} HTTP/1.1\r\n'
+            f'Host: {self.host}\r\n{headers}Connection: close\r\n\r\n'
+        ).encode()
+        while not stop.is_set():
+            try:
+                with socket.create_connection(
+                        (self.host, self.port), timeout=60) as sock:
+                    for byte in data:
+                        if stop.is_set():
+                            return
+                        sock.sendall(bytes((byte,)))
+                        time.sleep(delay)
+                    while not stop.is_set() and sock.recv(16):
+                        time.sleep(delay)
+            except OSError:
+                time.sleep(delay)
+
+    @staticmethod
+    def summary(latencies):
+        if not latencies:
+            return {}
+        latencies = sorted(latencies)
+        return {
+            **{f'p{percent}_ms': round(
+                percentile(latencies, percent) * 1000, 2)
+               for percent in PERCENTILES},
+            'max_ms': round(latencies[-1] * 1000, 2),
+        }
@@ -0,0 +1,43 @@
+''' Сравнение поиска ингредиентов по индексу и через ORM.'''
+
+import time
+
+from api.search import ingredients_index
+from django.core.management import BaseCommand
+from recipes.models import Ingredients
+
+QUERIES = ('а', 'мо', 'сах', 'кури', 'пш', 'я')
+
+
+class Command(BaseCommand):
+    help = 'Замеряет поиск ингредиентов по индексу в памяти и через ORM.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--repeat', type=int, default=200,
+            help='Сколько раз повторить каждый запрос.')
+        parser.add_argument(
+            '--queries', nargs='+', default=QUERIES,
+            help='Строки поиска.')
+
+    def handle(self, *args, **options):
+        repeat = options['repeat']
+        ingredients_index.refresh()
+        for query in options['queries']:
+            orm = self.measure(repeat, lambda: list(
+                Ingredients.objects.filter(name__istartswith=query)
+                .values('id', 'name', 'measurement_unit')))
+            index = self.measure(
+                repeat, lambda: ingredients_index.search(query))
+            self.stdout.write(
+                f'{query!r}: ORM {orm:.1f} мкс, индекс {index:.1f} мкс, '
+                f'найдено {len(ingredients_index.search(query))}'
+            )
+
+    @staticmethod
+    def measure(repeat, func):
+        """ Среднее время вызова в микросекундах."""
+        start = time.perf_counter()
+        for _ in range(repeat):
+            func()
+        return (time.perf_counter() - start) / repeat * 1_000_000
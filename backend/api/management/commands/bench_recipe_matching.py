@@ -0,0 +1,78 @@
+''' Сравнение подбора рецептов по индексу в памяти и через SQL.'''
+
+import random
+import time
+
+from api.matching import recipes_matcher
+from django.core.management import BaseCommand
+from django.db.models import Count, F, FloatField, Q
+from django.db.models.functions import Cast
+from recipes.models import IngredientsRecipes, Recipes
+
+HAND_SIZES = (3, 10, 30)
+
+
+def match_with_sql(ingredient_ids, limit):
+    """ Тот же подбор одним запросом с GROUP BY по всем рецептам."""
+    return list(
+        Recipes.objects.annotate(
+            matched=Count(
+                'amount_ingredients',
+                filter=Q(amount_ingredients__ingredients__in=ingredient_ids)),
+            total=Count('amount_ingredients'),
+        ).filter(matched__gt=0).annotate(
+            coverage=Cast('matched', FloatField()) / F('total')
+        ).order_by('-coverage', '-matched', '-id')
+        .values_list('id', 'matched', 'total')[:limit]
+    )
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет подбор рецептов по ингредиентам через инвертированный '
+        'индекс и через SQL и проверяет, что результаты совпадают.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--repeat', type=int, default=20,
+            help='Сколько наборов ингредиентов проверить для каждого размера.')
+        parser.add_argument(
+            '--sizes', nargs='+', type=int, default=HAND_SIZES,
+            help='Сколько ингредиентов есть у пользователя.')
+        parser.add_argument(
+            '--limit', type=int, default=6,
+            help='Сколько лучших рецептов сравнивать.')
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        recipes_matcher.refresh()
+        self.stdout.write(
+            f'Индекс: {len(recipes_matcher.recipes)} рецептов, '
+            f'{time.perf_counter() - start:.2f} с на построение'
+        )
+        used = list(IngredientsRecipes.objects.values_list(
+            'ingredients_id', flat=True).distinct())
+        if not used:
+            self.stdout.write('Нет рецептов с ингредиентами')
+            return
+        randomizer = random.Random(0)
+        limit = options['limit']
+        for size in options['sizes']:
+            sql_time = index_time = 0.0
+            for _ in range(options['repeat']):
+                hand = randomizer.sample(used, min(size, len(used)))
+                start = time.perf_counter()
+                expected = match_with_sql(hand, limit)
+                sql_time += time.perf_counter() - start
+                start = time.perf_counter()
+                actual = recipes_matcher.match(hand)[:limit]
+                index_time += time.perf_counter() - start
+                if actual != expected:
+                    self.stdout.write(self.style.ERROR(
+                        f'Результаты расходятся: {hand}'))
+            repeat = options['repeat']
+            self.stdout.write(
+                f'Ингредиентов {size}: SQL {sql_time / repeat * 1000:.2f} мс, '
+                f'индекс {index_time / repeat * 1000:.2f} мс'
+            )
@@ -0,0 +1,79 @@
+''' Замер количества запросов при формировании списка покупок.'''
+
+from api.services import get_shopping_list, render_shopping_list
+from django.core.management import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from recipes.models import (Ingredients, IngredientsRecipes, Recipes,
+                            ShoppingCart)
+from users.models import User
+
+CART_SIZES = (1, 10, 40)
+INGREDIENTS_PER_RECIPE = 10
+
+
+class Command(BaseCommand):
+    help = (
+        'Показывает, что число запросов для списка покупок '
+        'не зависит от размера корзины. Данные откатываются.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', nargs='+', type=int, default=CART_SIZES,
+            help='Размеры корзины для замера.')
+
+    def handle(self, *args, **options):
+        counts = set()
+        for size in options['sizes']:
+            with transaction.atomic():
+                user = self.fill_cart(size)
+                with CaptureQueriesContext(connection) as context:
+                    lines = list(
+                        render_shopping_list(get_shopping_list(user))
+                    )
+                transaction.set_rollback(True)
+            counts.add(len(context))
+            self.stdout.write(
+                f'Рецептов в корзине: {size}, позиций: {len(lines)}, '
+                f'запросов: {len(context)}'
+            )
+        if len(counts) == 1:
+            self.stdout.write(self.style.SUCCESS(
+                'Число запросов не зависит от размера корзины'))
+        else:
+            self.stdout.write(self.style.ERROR(
+                'Число запросов растёт вместе с корзиной'))
+
+    @staticmethod
+    def fill_cart(size):
+        """ Создаёт пользователя с корзиной из size рецептов."""
+        user = User.objects.create(
+            username='bench_shopping_list',
+            email='bench_shopping_list@example.com')
+        ingredients = Ingredients.objects.bulk_create(
+            Ingredients(name=f'bench_ingredient_{index}',
+                        measurement_unit='г')
+            for index in range(INGREDIENTS_PER_RECIPE * 2)
+        )
+        ingredients = list(Ingredients.objects.filter(
+            name__startswith='bench_ingredient_'))
+        recipes = [
+            Recipes.objects.create(
+                author=user, name=f'bench_recipe_{index}',
+                text='bench', cooking_time=1)
+            for index in range(size)
+        ]
+        IngredientsRecipes.objects.bulk_create(
+            IngredientsRecipes(
+                recipes=recipe,
+                ingredients=ingredients[
+                    (index + shift) % len(ingredients)],
+                amount=shift + 1)
+            for index, recipe in enumerate(recipes)
+            for shift in range(INGREDIENTS_PER_RECIPE)
+        )
+        ShoppingCart.objects.bulk_create(
+            ShoppingCart(user=user, recipes=recipe) for recipe in recipes
+        )
+        return user
@@ -0,0 +1,63 @@
+''' Проверка планов частых запросов через EXPLAIN.'''
+
+import re
+
+from django.core.management import BaseCommand, CommandError
+from django.db import connection
+from recipes.models import FavoriteResipes, Recipes, ShoppingCart
+from users.models import Subscriptions, User
+
+CHECKED_TABLES = (
+    Recipes._meta.db_table,
+    FavoriteResipes._meta.db_table,
+    ShoppingCart._meta.db_table,
+    Subscriptions._meta.db_table,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Выполняет EXPLAIN для частых запросов API и завершается ошибкой, '
+        'если Postgres не может обслужить их индексом.'
+    )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('Проверка планов доступна только для Postgres')
+        user, author, recipe = User(pk=1), User(pk=2), Recipes(pk=1)
+        queries = {
+            'лента рецептов': Recipes.objects.order_by(
+                '-pub_date', '-id')[:6],
+            'фильтр по автору': Recipes.objects.filter(author=author)[:6],
+            'фильтр по тегу': Recipes.objects.filter(
+                tags__slug='breakfast')[:6],
+            'рецепт в избранном': FavoriteResipes.objects.filter(
+                user=user, recipes=recipe),
+            'рецепт в корзине': ShoppingCart.objects.filter(
+                user=user, recipes=recipe),
+            'подписка на автора': Subscriptions.objects.filter(
+                user=user, author=author),
+        }
+        failed = []
+        with connection.cursor() as cursor:
+            # На маленьких таблицах планировщик предпочитает Seq Scan,
+            # поэтому проверяем, что индекс вообще может быть использован.
+            cursor.execute('SET enable_seqscan = off')
+            try:
+                for name, queryset in queries.items():
+                    plan = queryset.explain()
+                    scans = set(re.findall(r'Seq Scan on (\w+)', plan))
+                    bad = scans.intersection(CHECKED_TABLES)
+                    if bad:
+                        failed.append(name)
+                        self.stdout.write(self.style.ERROR(
+                            f'{name}: Seq Scan по {", ".join(sorted(bad))}'))
+                        self.stdout.write(plan)
+                    else:
+                        self.stdout.write(f'{name}: индекс используется')
+            finally:
+                cursor.execute('RESET enable_seqscan')
+        if failed:
+            raise CommandError(
+                f'Запросы без индекса: {", ".join(failed)}')
+        self.stdout.write(self.style.SUCCESS('Все запросы используют индексы'))
@@ -0,0 +1,144 @@
+""" Подбор рецептов по ингредиентам, которые есть у пользователя."""
+
+import threading
+import time
+from array import array
+from bisect import bisect_left, insort
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+from recipes.models import IngredientsRecipes
+
+from .cache import get_catalog_cache
+
+GENERATION_KEY = 'matcher:generation'
+SEQUENCE_KEY = 'matcher:sequence'
+# Сколько последних изменений рецептов хранится в кэше. Процесс, который
+# отстал сильнее, перестраивает индекс целиком.
+MAX_CHANGES = 1000
+
+
+def change_key(sequence):
+    return f'matcher:change:{sequence}'
+
+
+def record_change(recipe_id):
+    """ Сообщает всем процессам, что ингредиенты рецепта изменились."""
+    cache = get_catalog_cache()
+    cache.add(SEQUENCE_KEY, 0, None)
+    sequence = cache.incr(SEQUENCE_KEY)
+    cache.set(change_key(sequence), recipe_id, settings.CATALOG_CACHE_TIMEOUT)
+
+
+def invalidate_matcher():
+    """ Заставляет все процессы перестроить индекс, например после импорта."""
+    get_catalog_cache().set(GENERATION_KEY, time.time(), None)
+
+
+class RecipesMatcher:
+    """ Инвертированный индекс: ингредиент -> отсортированные id рецептов.
+
+    Списки рецептов хранятся в array('I'), совпадения считаются
+    Counter.update, который проходит массивы на C. Изменения рецептов
+    приходят через кэш и применяются точечно, без перестройки индекса.
+    Кэш по умолчанию у каждого процесса свой, поэтому индекс ещё и
+    перестраивается целиком раз в MATCHER_REBUILD_SECONDS.
+    """
+
+    def __init__(self):
+        self.generation = None
+        self.sequence = 0
+        self.built_at = None
+        self.postings = {}
+        self.recipes = {}
+        self.lock = threading.Lock()
+
+    def build(self):
+        postings = defaultdict(lambda: array('I'))
+        recipes = defaultdict(lambda: array('I'))
+        # Индекс общий для процесса, поэтому читается из основной базы,
+        # а не из реплики, которая может отставать.
+        rows = IngredientsRecipes.objects.using(DEFAULT_DB_ALIAS).order_by(
+            'recipes_id', 'ingredients_id'
+        ).values_list('recipes_id', 'ingredients_id')
+        for recipe_id, ingredient_id in rows.iterator():
+            postings[ingredient_id].append(recipe_id)
+            recipes[recipe_id].append(ingredient_id)
+        self.postings = dict(postings)
+        self.recipes = dict(recipes)
+        self.built_at = time.monotonic()
+
+    def apply_changes(self, recipe_ids):
+        """ Перечитывает ингредиенты изменённых рецептов одним запросом."""
+        current = defaultdict(lambda: array('I'))
+        rows = IngredientsRecipes.objects.using(DEFAULT_DB_ALIAS).filter(
+            recipes_id__in=recipe_ids
+        ).order_by('ingredients_id').values_list(
+            'recipes_id', 'ingredients_id')
+        for recipe_id, ingredient_id in rows:
+            current[recipe_id].append(ingredient_id)
+        for recipe_id in recipe_ids:
+            for ingredient_id in self.recipes.pop(recipe_id, ()):
+                posting = self.postings[ingredient_id]
+                del posting[bisect_left(posting, recipe_id)]
+            if recipe_id not in current:
+                continue
+            self.recipes[recipe_id] = current[recipe_id]
+            for ingredient_id in current[recipe_id]:
+                insort(self.postings.setdefault(
+                    ingredient_id, array('I')), recipe_id)
+
+    def refresh(self):
+        cache = get_catalog_cache()
+        generation = cache.get_or_set(GENERATION_KEY, time.time, None)
+        sequence = cache.get(SEQUENCE_KEY, 0)
+        if (generation == self.generation and sequence == self.sequence
+                and not self.expired()):
+            return
+        with self.lock:
+            if generation != self.generation or self.expired():
+                self.build()
+            elif sequence != self.sequence:
+                keys = [change_key(number) for number in
+                        range(self.sequence + 1, sequence + 1)]
+                changes = cache.get_many(keys)
+                if len(keys) > MAX_CHANGES or len(changes) != len(keys):
+                    self.build()
+                else:
+                    self.apply_changes(set(changes.values()))
+            self.generation, self.sequence = generation, sequence
+
+    def expired(self):
+        return (self.built_at is None
+                or time.monotonic() - self.built_at
+                > settings.MATCHER_REBUILD_SECONDS)
+
+    def match(self, ingredient_ids, max_missing=None):
+        """ Рецепты с долей имеющихся ингредиентов, лучшие первыми.
+
+        Возвращает кортежи (id рецепта, найдено, всего ингредиентов).
+        """
+        self.refresh()
+        counts = Counter()
+        for ingredient_id in set(ingredient_ids):
+            counts.update(self.postings.get(ingredient_id, ()))
+        results = []
+        for recipe_id, matched in counts.items():
+            total = len(self.recipes.get(recipe_id, ()))
+            if not total:
+                continue
+            if max_missing is None or total - matched <= max_missing:
+                results.append((recipe_id, matched, total))
+        results.sort(key=lambda item: (
+            item[1] / item[2], item[1], item[0]), reverse=True)
+        return results
+
+    def missing(self, recipe_id, ingredient_ids):
+        """ Ингредиенты рецепта, которых нет среди ingredient_ids."""
+        return [ingredient_id
+                for ingredient_id in self.recipes.get(recipe_id, ())
+                if ingredient_id not in ingredient_ids]
+
+
+recipes_matcher = RecipesMatcher()
@@ -0,0 +1,261 @@
+""" Метрики запросов: число SQL-запросов, время БД и сериализации."""
+
+import asyncio
+import logging
+import threading
+import time
+from collections import defaultdict
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from django.http import HttpResponse
+
+from .authentication import token_cache
+
+logger = logging.getLogger(__name__)
+
+# Границы гистограммы длительности запроса в секундах.
+DURATION_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+UNRESOLVED_VIEW = '<unresolved>'
+
+
+class QueryCounter:
+    """ Обёртка execute_wrapper, считающая запросы и время в БД."""
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+
+
+class ViewStats:
+    """ Накопленные значения по одному view."""
+    def __init__(self):
+        self.requests = 0
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.serialize_seconds = 0.0
+        self.duration_seconds = 0.0
+        self.response_bytes = 0
+        self.budget_exceeded = 0
+        self.buckets = [0] * len(DURATION_BUCKETS)
+
+
+class MetricsRegistry:
+    """ Потокобезопасное хранилище метрик в памяти процесса."""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.views = defaultdict(ViewStats)
+        self.connections = defaultdict(int)
+
+    def record(self, view, queries, db, serialize, duration, size,
+               over_budget):
+        with self.lock:
+            stats = self.views[view]
+            stats.requests += 1
+            stats.queries += queries
+            stats.db_seconds += db
+            stats.serialize_seconds += serialize
+            stats.duration_seconds += duration
+            stats.response_bytes += size
+            stats.budget_exceeded += over_budget
+            for index, bound in enumerate(DURATION_BUCKETS):
+                if duration <= bound:
+                    stats.buckets[index] += 1
+
+    def connection_opened(self, alias):
+        with self.lock:
+            self.connections[alias] += 1
+
+    def reset(self):
+        with self.lock:
+            self.views.clear()
+            self.connections.clear()
+
+    def render(self):
+        """ Метрики в текстовом формате Prometheus."""
+        counters = (
+            ('requests_total', 'Число запросов.', 'requests'),
+            ('db_queries_total', 'Число SQL-запросов.', 'queries'),
+            ('db_seconds_total', 'Время в БД.', 'db_seconds'),
+            ('serialize_seconds_total',
+             'Время view вне БД, в основном сериализация.',
+             'serialize_seconds'),
+            ('response_bytes_total', 'Размер ответов.', 'response_bytes'),
+            ('query_budget_exceeded_total',
+             'Запросы сверх бюджета SQL-запросов.', 'budget_exceeded'),
+        )
+        with self.lock:
+            views = sorted(self.views.items())
+            lines = []
+            for name, description, attr in counters:
+                lines.append(f'# HELP foodgram_{name} {description}')
+                lines.append(f'# TYPE foodgram_{name} counter')
+                lines.extend(
+                    f'foodgram_{name}{{view="{view}"}} '
+                    f'{getattr(stats, attr)}'
+                    for view, stats in views
+                )
+            lines.append(
+                '# HELP foodgram_request_duration_seconds '
+                'Длительность запроса.')
+            lines.append('# TYPE foodgram_request_duration_seconds histogram')
+            for view, stats in views:
+                for bound, count in zip(DURATION_BUCKETS, stats.buckets):
+                    lines.append(
+                        f'foodgram_request_duration_seconds_bucket'
+                        f'{{view="{view}",le="{bound}"}} {count}')
+                lines.append(
+                    f'foodgram_request_duration_seconds_bucket'
+                    f'{{view="{view}",le="+Inf"}} {stats.requests}')
+                lines.append(
+                    f'foodgram_request_duration_seconds_sum'
+                    f'{{view="{view}"}} {stats.duration_seconds}')
+                lines.append(
+                    f'foodgram_request_duration_seconds_count'
+                    f'{{view="{view}"}} {stats.requests}')
+            lines.append(
+                '# HELP foodgram_db_connections_opened_total '
+                'Открыто соединений с базой.')
+            lines.append('# TYPE foodgram_db_connections_opened_total counter')
+            lines.extend(
+                f'foodgram_db_connections_opened_total{{alias="{alias}"}} '
+                f'{count}'
+                for alias, count in sorted(self.connections.items())
+            )
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+
+def count_queries(counter):
+    """ Подключает счётчик ко всем базам в текущем потоке."""
+    stack = ExitStack()
+    for connection in connections.all():
+        stack.enter_context(connection.execute_wrapper(counter))
+    return stack
+
+
+def query_budget(method, view):
+    """ Бюджет по методу и view: у записи и чтения он разный."""
+    if method == 'HEAD':
+        method = 'GET'
+    return settings.QUERY_BUDGETS.get(
+        f'{method} {view}', settings.QUERY_BUDGET_DEFAULT)
+
+
+class QueryMetricsMiddleware:
+    """ Считает SQL-запросы, время БД и сериализации для каждого view.
+
+    Результат отдаётся в заголовке Server-Timing и копится в registry.
+    Время сериализации — время от вызова view до готового ответа за
+    вычетом времени в БД. Запросы, выполняемые при отдаче
+    StreamingHttpResponse, уже не попадают в подсчёт.
+
+    Под ASGI view выполняется в другом потоке, поэтому счётчик
+    подключается к соединению того потока, где работает view:
+    в process_view для синхронных view и в api.async_views для
+    асинхронных.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        counter = self.start(request)
+        with count_queries(counter):
+            response = self.get_response(request)
+        return self.finish(request, response)
+
+    async def __acall__(self, request):
+        counter = self.start(request)
+        request._metrics_counter = counter
+        try:
+            response = await self.get_response(request)
+        finally:
+            for wrappers in getattr(request, '_metrics_wrappers', ()):
+                if counter in wrappers:
+                    wrappers.remove(counter)
+        return self.finish(request, response)
+
+    @staticmethod
+    def start(request):
+        request._metrics_view_start = None
+        request._metrics_start = time.perf_counter()
+        request._metrics_query_counter = QueryCounter()
+        return request._metrics_query_counter
+
+    def finish(self, request, response):
+        counter = request._metrics_query_counter
+        duration = time.perf_counter() - request._metrics_start
+        match = request.resolver_match
+        view = match.view_name if match else UNRESOLVED_VIEW
+        if view == 'metrics':
+            return response
+        serialize = 0.0
+        if request._metrics_view_start is not None:
+            view_start, db_before = request._metrics_view_start
+            serialize = max(
+                request._metrics_start + duration - view_start
+                - (counter.duration - db_before), 0.0)
+        budget = query_budget(request.method, view)
+        over_budget = budget is not None and counter.count > budget
+        if over_budget:
+            logger.warning(
+                '%s %s: %d SQL-запросов при бюджете %d',
+                request.method, view, counter.count, budget)
+        size = 0 if response.streaming else len(response.content)
+        registry.record(view, counter.count, counter.duration, serialize,
+                        duration, size, over_budget)
+        response['Server-Timing'] = (
+            f'db;dur={counter.duration * 1000:.1f};'
+            f'desc="{counter.count} queries", '
+            f'serialize;dur={serialize * 1000:.1f}, '
+            f'total;dur={duration * 1000:.1f}'
+        )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        counter = request._metrics_query_counter
+        if getattr(request, '_metrics_counter', None) is counter:
+            request._metrics_wrappers = [
+                connection.execute_wrappers
+                for connection in connections.all()
+                if counter not in connection.execute_wrappers
+            ]
+            for wrappers in request._metrics_wrappers:
+                wrappers.append(counter)
+        request._metrics_view_start = (time.perf_counter(), counter.duration)
+
+
+def render_token_cache():
+    lines = [
+        '# HELP foodgram_token_cache_total Обращения к кэшу токенов.',
+        '# TYPE foodgram_token_cache_total counter',
+    ]
+    lines.extend(
+        f'foodgram_token_cache_total{{result="{result}"}} {count}'
+        for result, count in sorted(token_cache.stats.items())
+    )
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_view(request):
+    """ Накопленные метрики процесса в формате Prometheus."""
+    return HttpResponse(
+        registry.render() + render_token_cache(),
+        content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,8 @@
+""" Настройка выбора формата ответа."""
+from rest_framework.negotiation import DefaultContentNegotiation
+
+
+class IgnoreFormatContentNegotiation(DefaultContentNegotiation):
+    """ Не учитывает параметр format, ошибки всегда отдаются в JSON."""
+    def select_renderer(self, request, renderers, format_suffix=None):
+        return (renderers[0], renderers[0].media_type)
@@ -1,8 +1,171 @@
 """ Файл для настройки пагинации."""
-from rest_framework.pagination import PageNumberPagination
+import re
+from base64 import b64decode, b64encode
+from collections import OrderedDict
+from urllib import parse
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
 
 
 class LimitPageNumberPagination(PageNumberPagination):
     """ Настраиваем пагинацию, 6 рецептов на страницу."""
     page_size = 6
     page_size_query_param = 'limit'
+
+
+class RecipesCursorPagination(BasePagination):
+    """ Курсорная пагинация рецептов по ключу (pub_date, id).
+
+    Вместо OFFSET следующая страница выбирается условием по ключу
+    последнего рецепта, поэтому глубокие страницы не замедляются.
+    Поле count считается точно, оценивается планировщиком Postgres
+    или не считается вовсе в зависимости от RECIPES_PAGINATION_COUNT.
+    """
+    page_size = 6
+    page_size_query_param = 'limit'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Неверный курсор.'
+    ordering = ('pub_date', 'id')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.count = self.get_count(queryset)
+        position, self.reverse = self.decode_cursor(request)
+        date_field, key_field = self.ordering
+        if position is not None:
+            pub_date, pk = position
+            lookup = 'gt' if self.reverse else 'lt'
+            queryset = queryset.filter(
+                Q(**{f'{date_field}__{lookup}': pub_date})
+                | Q(**{date_field: pub_date, f'{key_field}__{lookup}': pk}))
+        ordering = (
+            self.ordering if self.reverse
+            else tuple(f'-{field}' for field in self.ordering))
+        results = list(queryset.order_by(*ordering)[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        self.page = results[:self.page_size]
+        if self.reverse:
+            self.page.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, position is not None
+        return self.page
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if page_size <= 0:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def get_count(self, queryset):
+        mode = settings.RECIPES_PAGINATION_COUNT
+        if mode == 'none':
+            return None
+        if mode == 'estimate':
+            return self.estimate_count(queryset)
+        return queryset.count()
+
+    @staticmethod
+    def estimate_count(queryset):
+        """ Оценка числа строк по плану запроса Postgres."""
+        if connections[queryset.db].vendor != 'postgresql':
+            return queryset.count()
+        plan = queryset.order_by().explain()
+        match = re.search(r'rows=(\d+)', plan)
+        return int(match.group(1)) if match else queryset.count()
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            tokens = parse.parse_qs(
+                b64decode(encoded.encode('ascii')).decode('ascii'))
+            pub_date = parse_datetime(tokens['p'][0])
+            pk = int(tokens['i'][0])
+            reverse = tokens.get('r', ['0'])[0] == '1'
+        except (TypeError, ValueError, KeyError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+        if pub_date is None:
+            raise NotFound(self.invalid_cursor_message)
+        return (pub_date, pk), reverse
+
+    def encode_cursor(self, item, reverse):
+        date_field, key_field = self.ordering
+        tokens = {
+            'p': getattr(item, date_field).isoformat(),
+            'i': getattr(item, key_field),
+        }
+        if reverse:
+            tokens['r'] = '1'
+        encoded = b64encode(
+            parse.urlencode(tokens).encode('ascii')).decode('ascii')
+        return replace_query_param(
+            self.base_url, self.cursor_query_param, encoded)
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(
+                self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('count', self.count),
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'count': {'type': 'integer', 'nullable': True},
+                'next': {'type': 'string', 'nullable': True},
+                'previous': {'type': 'string', 'nullable': True},
+                'results': schema,
+            },
+        }
+
+
+class FeedCursorPagination(RecipesCursorPagination):
+    """ Курсорная пагинация ленты по ключу (pub_date, recipes_id).
+
+    Поля count в ответе нет: подсчёт всей ленты пользователя на каждой
+    странице стоил бы дороже самой страницы.
+    """
+    ordering = ('pub_date', 'recipes_id')
+
+    def get_count(self, queryset):
+        return None
+
+    def get_paginated_response(self, data):
+        response = super().get_paginated_response(data)
+        del response.data['count']
+        return response
+
+    def get_paginated_response_schema(self, schema):
+        response_schema = super().get_paginated_response_schema(schema)
+        del response_schema['properties']['count']
+        return response_schema
@@ -0,0 +1,47 @@
+""" Связи текущего пользователя, загружаемые один раз за запрос."""
+
+from django.contrib.auth.models import AnonymousUser
+from django.utils.functional import cached_property
+from recipes.models import FavoriteResipes, ShoppingCart
+from users.models import Subscriptions
+
+
+class UserRelations:
+    """ Множества id авторов, избранных рецептов и рецептов в корзине.
+
+    Каждое множество загружается одним запросом при первом обращении,
+    дальше проверка принадлежности не обращается к базе.
+    """
+
+    def __init__(self, user):
+        self.user = user
+
+    def load(self, model, field):
+        if not self.user.is_authenticated:
+            return frozenset()
+        return frozenset(model.objects.filter(
+            user=self.user).values_list(field, flat=True))
+
+    @cached_property
+    def subscribed_authors(self):
+        return self.load(Subscriptions, 'author_id')
+
+    @cached_property
+    def favorite_recipes(self):
+        return self.load(FavoriteResipes, 'recipes_id')
+
+    @cached_property
+    def cart_recipes(self):
+        return self.load(ShoppingCart, 'recipes_id')
+
+
+def get_relations(context):
+    """ UserRelations запроса из контекста сериализатора."""
+    request = context.get('request')
+    if request is None:
+        return UserRelations(AnonymousUser())
+    relations = getattr(request, '_user_relations', None)
+    if relations is None:
+        relations = UserRelations(request.user)
+        request._user_relations = relations
+    return relations
@@ -0,0 +1,90 @@
+""" Чтение из реплики базы с закреплением за основной после записи."""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, connections
+from rest_framework.permissions import SAFE_METHODS
+
+# База для чтения в текущем запросе, None — основная.
+read_database = ContextVar('read_database', default=None)
+
+
+def pin_key(user_id):
+    return f'replica:pin:{user_id}'
+
+
+def pin_to_primary(user_id):
+    """ Пользователь что-то записал: его чтения идут в основную базу."""
+    caches[settings.REPLICA_PIN_ALIAS].set(
+        pin_key(user_id), True, settings.REPLICA_PIN_SECONDS)
+
+
+def is_pinned(user):
+    return user.is_authenticated and bool(
+        caches[settings.REPLICA_PIN_ALIAS].get(pin_key(user.pk)))
+
+
+@contextmanager
+def use_primary(condition=True):
+    """ Временно читает из основной базы."""
+    token = read_database.set(None) if condition else None
+    try:
+        yield
+    finally:
+        if token is not None:
+            read_database.reset(token)
+
+
+class ReplicaRouter:
+    """ Отправляет чтения в базу, выбранную для запроса, записи в основную.
+
+    Вне view с ReplicaReadMixin, внутри транзакции и без настроенной
+    реплики все запросы идут в основную базу.
+    """
+
+    def db_for_read(self, model, **hints):
+        alias = read_database.get()
+        if alias is None or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return alias
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+class ReplicaReadMixin:
+    """ Безопасные запросы view читают из реплики.
+
+    Запрос пользователя, который недавно что-то изменил, читает из
+    основной базы REPLICA_PIN_SECONDS секунд, чтобы он увидел свои
+    изменения, даже если реплика отстаёт.
+    """
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if (settings.REPLICA_DATABASE
+                and request.method in SAFE_METHODS
+                and not is_pinned(request.user)):
+            self._read_database = read_database.set(
+                settings.REPLICA_DATABASE)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        token = getattr(self, '_read_database', None)
+        if token is not None:
+            read_database.reset(token)
+            self._read_database = None
+        if (settings.REPLICA_DATABASE
+                and request.method not in SAFE_METHODS
+                and response.status_code < 400
+                and request.user.is_authenticated):
+            pin_to_primary(request.user.pk)
+        return super().finalize_response(request, response, *args, **kwargs)
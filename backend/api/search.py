@@ -0,0 +1,85 @@
+""" Поиск ингредиентов по индексу в памяти процесса."""
+
+import threading
+from array import array
+from bisect import bisect_left
+from collections import defaultdict
+
+from django.db import DEFAULT_DB_ALIAS
+from recipes.models import Ingredients
+
+from .cache import get_catalog_version
+
+MAX_CHAR = '\U0010ffff'
+# Длина самых длинных подстрок в индексе вхождений.
+NGRAM_SIZE = 3
+
+
+def ngrams(text, size):
+    return {text[index:index + size]
+            for index in range(len(text) - size + 1)}
+
+
+class IngredientsIndex:
+    """ Отсортированный индекс названий ингредиентов.
+
+    Строится один раз на процесс и перестраивается, когда меняется
+    версия справочника ингредиентов в кэше. Совпадения по началу
+    названия ищутся двоичным поиском, по вхождению — по индексу
+    подстрок длиной до NGRAM_SIZE: короткий запрос берётся из него
+    целиком, у длинного проверяются только названия с самой редкой
+    из его триграмм.
+    """
+
+    def __init__(self):
+        self.version = None
+        self.entries = ((), (), {})
+        self.lock = threading.Lock()
+
+    def build(self):
+        # Индекс живёт до следующей смены версии, поэтому строится по
+        # основной базе, а не по реплике, которая могла отстать.
+        rows = sorted(
+            Ingredients.objects.using(DEFAULT_DB_ALIAS).values(
+                'id', 'name', 'measurement_unit'),
+            key=lambda row: (row['name'].casefold(), row['id'])
+        )
+        keys = tuple(row['name'].casefold() for row in rows)
+        postings = defaultdict(lambda: array('I'))
+        for index, key in enumerate(keys):
+            for size in range(1, NGRAM_SIZE + 1):
+                for gram in ngrams(key, size):
+                    postings[gram].append(index)
+        self.entries = (keys, tuple(rows), dict(postings))
+
+    def refresh(self):
+        version = get_catalog_version(Ingredients)
+        if version == self.version:
+            return
+        with self.lock:
+            if version != self.version:
+                self.build()
+                self.version = version
+
+    def search(self, query):
+        """ Сначала совпадения по началу названия, затем по вхождению."""
+        self.refresh()
+        keys, rows, postings = self.entries
+        query = query.casefold()
+        start = bisect_left(keys, query)
+        end = bisect_left(keys, query + MAX_CHAR, start)
+        if len(query) <= NGRAM_SIZE:
+            candidates = postings.get(query, ())
+        else:
+            candidates = min(
+                (postings.get(gram, ()) for gram in ngrams(
+                    query, NGRAM_SIZE)),
+                key=len)
+        contains = [
+            rows[index] for index in candidates
+            if not start <= index < end and query in keys[index]
+        ]
+        return list(rows[start:end]) + contains
+
+
+ingredients_index = IngredientsIndex()
@@ -1,6 +1,7 @@
 """ Файл настройки селиализаторов."""
 
-from django.shortcuts import get_object_or_404
+from django.db import IntegrityError, transaction
+from django.db.models import prefetch_related_objects
 from rest_framework import serializers, status
 from rest_framework.exceptions import ValidationError
 from rest_framework.fields import SerializerMethodField
@@ -9,11 +10,13 @@ from recipes.models import (FavoriteResipes, Ingredients, IngredientsRecipes,
                             Recipes, ShoppingCart, Tags)
 from users.models import Subscriptions, User
 from users.serializers import CustomUserSerializer
-from .fields import Base64ImageField
+from .fields import Base64ImageField, RenditionImageField
+from .relations import get_relations
 
 
 class RecipesShortSerializer(serializers.ModelSerializer):
     """ Сериализатор полей избранных рецептов и покупок."""
+    image = RenditionImageField('image_thumbnail')
 
     class Meta:
         model = Recipes
@@ -27,23 +30,32 @@ class IngredientsSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 
-class ShoppingCartSerializer(serializers.ModelSerializer):
+class UniqueCreateMixin:
+    """ Превращает нарушение уникальности при создании в ошибку 400."""
+    duplicate_error = 'Запись уже существует'
+
+    def create(self, validated_data):
+        try:
+            with transaction.atomic():
+                return super().create(validated_data)
+        except IntegrityError:
+            raise serializers.ValidationError(self.duplicate_error)
+
+
+class ShoppingCartSerializer(UniqueCreateMixin, serializers.ModelSerializer):
     """ Сериализатор для списка покупок."""
+    duplicate_error = 'Рецепт уже добавлен в корзину'
+
     class Meta:
         model = ShoppingCart
         fields = ('user', 'recipes',)
 
-    def validate(self, data):
-        user = data['user']
-        if user.shopping_cart.filter(recipes=data['recipes']).exists():
-            raise serializers.ValidationError(
-                'Рецепт уже добавлен в корзину'
-            )
-        return data
-
 
-class FavoriteResipesSerializer(serializers.ModelSerializer):
+class FavoriteResipesSerializer(UniqueCreateMixin,
+                                serializers.ModelSerializer):
     """ Сериализатор избранных рецептов."""
+    duplicate_error = {'status': 'Рецепт уже есть в избранном!'}
+
     class Meta:
         model = FavoriteResipes
         fields = ('user', 'recipes')
@@ -52,13 +64,6 @@ class FavoriteResipesSerializer(serializers.ModelSerializer):
         request = self.context.get('request')
         if not request or request.user.is_anonymous:
             return False
-        recipes = data['recipes']
-        if FavoriteResipes.objects.filter(
-            user=request.user, recipes=recipes
-        ).exists():
-            raise serializers.ValidationError({
-                'status': 'Рецепт уже есть в избранном!'
-            })
         return data
 
 
@@ -92,12 +97,12 @@ class IngredientsGetSerializer(serializers.ModelSerializer):
 
 class RecipesReadSerializer(serializers.ModelSerializer):
     """ Сериализатор чтения рецептов."""
-    tags = serializers.SerializerMethodField()
+    tags = TagsSerializer(many=True, read_only=True)
     ingredients = IngredientsGetSerializer(
         many=True,
         source ='amount_ingredients')
     author = CustomUserSerializer(read_only=True)
-    image = Base64ImageField()
+    image = RenditionImageField('image_card')
     is_favorited = serializers.SerializerMethodField()
     is_in_shopping_cart = serializers.SerializerMethodField()
 
@@ -118,28 +123,27 @@ class RecipesReadSerializer(serializers.ModelSerializer):
     read_only_fields = ('id', 'author', 'is_favorited',
                         'is_favorited')
 
-    def get_tags(self, obj):
-        return TagsSerializer(
-            Tags.objects.filter(recipes=obj),
-            many=True,).data
-
     def get_is_in_shopping_cart(self, obj):
-        request = self.context.get('request')
-        if request.user.is_anonymous:
-            return False
-        return ShoppingCart.objects.filter(
-            user=request.user,
-            recipes=obj.id
-        ).exists()
+        if hasattr(obj, 'is_in_shopping_cart'):
+            return obj.is_in_shopping_cart
+        return obj.id in get_relations(self.context).cart_recipes
 
     def get_is_favorited(self, obj):
-        request = self.context.get('request')
-        if request.user.is_anonymous:
-            return False
-        return FavoriteResipes.objects.filter(
-            user=request.user,
-            recipes=obj.id
-        ).exists()
+        if hasattr(obj, 'is_favorited'):
+            return obj.is_favorited
+        return obj.id in get_relations(self.context).favorite_recipes
+
+
+class RecipesMatchSerializer(RecipesReadSerializer):
+    """ Рецепт с тем, сколько его ингредиентов есть у пользователя."""
+    matched_ingredients = serializers.IntegerField(read_only=True)
+    total_ingredients = serializers.IntegerField(read_only=True)
+    missing_ingredients = IngredientsSerializer(many=True, read_only=True)
+
+    class Meta(RecipesReadSerializer.Meta):
+        fields = RecipesReadSerializer.Meta.fields + (
+            'matched_ingredients', 'total_ingredients', 'missing_ingredients',
+        )
 
 
 class ShortRecipesSerializer(serializers.ModelSerializer):
@@ -176,14 +180,17 @@ class SubscriptionsSerializer(CustomUserSerializer):
         return data
 
     def get_recipes_count(self, author):
-        return author.recipes.count()
+        return author.recipes_count
 
     def get_recipes(self, author):
-        request = self.context.get('request')
-        limit = request.GET.get('recipes_limit')
-        recipes = author.recipes.all()
-        if limit:
-            recipes = recipes[:int(limit)]
+        if hasattr(author, 'latest_recipes'):
+            recipes = author.latest_recipes
+        else:
+            request = self.context.get('request')
+            limit = request.GET.get('recipes_limit')
+            recipes = author.recipes.all()
+            if limit:
+                recipes = recipes[:int(limit)]
         serializer = RecipesShortSerializer(recipes, many=True, read_only=True)
         return serializer.data
 
@@ -213,25 +220,33 @@ class RecipesCreateSerializer(serializers.ModelSerializer):
         )
 
     def validate(self, data):
-        ingredients = self.initial_data['ingredients']
+        ingredients = data.get('amount_ingredients')
+        if ingredients is None and self.partial:
+            return data
 
         if not ingredients:
             raise serializers.ValidationError(
                 'Минимально должен быть 1 ингредиент.'
             )
 
-        ingredient_list = []
         for item in ingredients:
             if not item.get('id') or not item.get('amount'):
                 raise serializers.ValidationError(
                     'Обязательно нужно указать id ингредиента и его количество'
                 )
-            ingredient = get_object_or_404(Ingredients, id=item['id'])
-            if ingredient in ingredient_list:
-                raise serializers.ValidationError(
-                    'Ингредиент не должен повторяться.'
-                )
-            ingredient_list.append(ingredient)
+        ids = [item['id'] for item in ingredients]
+        if len(set(ids)) != len(ids):
+            raise serializers.ValidationError(
+                'Ингредиент не должен повторяться.'
+            )
+        ingredients_map = Ingredients.objects.in_bulk(ids)
+        missing = [pk for pk in ids if pk not in ingredients_map]
+        if missing:
+            raise serializers.ValidationError(
+                f'Ингредиенты не найдены: {missing}'
+            )
+        for item in ingredients:
+            item['ingredients'] = ingredients_map[item['id']]
         return data
 
     @staticmethod
@@ -239,42 +254,61 @@ class RecipesCreateSerializer(serializers.ModelSerializer):
         """Добавляет ингредиенты в рецепт."""
         ingredients_list = [
             IngredientsRecipes(
-                ingredients=get_object_or_404(
-                    Ingredients, pk=ingredients.get('id')
-                ),
-                recipes=recipes, amount=ingredients.get('amount'),
+                ingredients=item['ingredients'],
+                recipes=recipes, amount=item['amount'],
             )
-            for ingredients in ingredients
+            for item in ingredients
         ]
         ingredients_list.sort(key=(lambda item: item.ingredients.name))
         IngredientsRecipes.objects.bulk_create(ingredients_list)
 
+    @transaction.atomic
     def create(self, validated_data):
         ingredients = validated_data.pop('amount_ingredients')
         tags_data = validated_data.pop('tags')
         recipe = Recipes.objects.create(**validated_data)
         recipe.tags.set(tags_data)
-        for ingredient in ingredients:
-            id = ingredient.get('id')
-            amount = ingredient.get('amount')
-            ingredient_id = get_object_or_404(Ingredients, id=id)
-            IngredientsRecipes.objects.create(
-                recipes=recipe, ingredients=ingredient_id, amount=amount
-            )
+        self.create_ingredients(ingredients, recipe)
         return recipe
 
+    def update_ingredients(self, ingredients, recipes):
+        """Приводит ингредиенты рецепта к переданному списку."""
+        current = {
+            item.ingredients_id: item
+            for item in recipes.amount_ingredients.all()
+        }
+        submitted = {item['ingredients'].id: item for item in ingredients}
+        removed = current.keys() - submitted.keys()
+        if removed:
+            IngredientsRecipes.objects.filter(
+                recipes=recipes, ingredients_id__in=removed
+            ).delete()
+        changed = []
+        for pk, item in current.items():
+            if pk in submitted and item.amount != submitted[pk]['amount']:
+                item.amount = submitted[pk]['amount']
+                changed.append(item)
+        IngredientsRecipes.objects.bulk_update(changed, ('amount',))
+        self.create_ingredients(
+            [item for pk, item in submitted.items() if pk not in current],
+            recipes
+        )
+
+    @transaction.atomic
     def update(self, instance, validated_data):
-        """Обновляет рецепт."""
-        instance.tags.clear()
-        instance.ingredients.clear()
-        tags = validated_data.pop('tags')
-        ingredients = validated_data.pop('amount_ingredients')
-        instance.tags.set(tags)
-        self.create_ingredients(ingredients, instance)
+        """Обновляет рецепт, изменяя только отличающиеся связи."""
+        tags = validated_data.pop('tags', None)
+        ingredients = validated_data.pop('amount_ingredients', None)
+        if tags is not None:
+            instance.tags.set(tags)
+        if ingredients is not None:
+            self.update_ingredients(ingredients, instance)
         return super().update(instance, validated_data)
 
     def to_representation(self, instance):
         """Метод для отображения данных в соответствии с ТЗ."""
+        prefetch_related_objects(
+            [instance], 'tags', 'amount_ingredients__ingredients')
         return RecipesReadSerializer(
             instance, context={'request': self.context.get('request')}
         ).data
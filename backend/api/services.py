@@ -0,0 +1,92 @@
+""" Сервисные функции для работы со списком покупок."""
+
+import csv
+import io
+
+from django.conf import settings
+from django.db.models import Sum
+from recipes.models import IngredientsRecipes
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
+
+PDF_FONT = 'ShoppingListFont'
+PDF_FONT_SIZE = 12
+PDF_MARGIN = 50
+PDF_LINE_HEIGHT = 18
+CHUNK_SIZE = 64 * 1024
+
+
+def get_shopping_list(user):
+    """ Суммирует ингредиенты корзины пользователя одним запросом."""
+    return (
+        IngredientsRecipes.objects
+        .filter(recipes__shopping_cart__user=user)
+        .values('ingredients__name', 'ingredients__measurement_unit')
+        .annotate(amount=Sum('amount'))
+        .order_by('ingredients__name', 'ingredients__measurement_unit')
+    )
+
+
+def render_shopping_list(ingredients):
+    """ Построчно формирует текст списка покупок."""
+    for item in ingredients:
+        yield (
+            f'* {item["ingredients__name"]} '
+            f'({item["ingredients__measurement_unit"]}) - {item["amount"]}\n'
+        )
+
+
+class Echo:
+    """ Файлоподобный объект, который возвращает записанную строку."""
+
+    def write(self, value):
+        return value
+
+
+def render_shopping_list_csv(ingredients):
+    """ Построчно формирует CSV со списком покупок."""
+    writer = csv.writer(Echo())
+    yield writer.writerow(('Ингредиент', 'Единица измерения', 'Количество'))
+    for item in ingredients:
+        yield writer.writerow((
+            item['ingredients__name'],
+            item['ingredients__measurement_unit'],
+            item['amount'],
+        ))
+
+
+def render_shopping_list_pdf(ingredients):
+    """ Формирует PDF со списком покупок и отдаёт его частями.
+
+    Страницы закрываются по мере заполнения, но таблицу ссылок PDF
+    reportlab пишет только при сохранении, поэтому документ отдаётся
+    после отрисовки последней страницы.
+    """
+    if PDF_FONT not in pdfmetrics.getRegisteredFontNames():
+        pdfmetrics.registerFont(TTFont(PDF_FONT, settings.PDF_FONT_PATH))
+    buffer = io.BytesIO()
+    pdf = canvas.Canvas(buffer, pagesize=A4)
+    width, height = A4
+    top = height - PDF_MARGIN
+    pdf.setFont(PDF_FONT, PDF_FONT_SIZE)
+    pdf.drawString(PDF_MARGIN, top, 'Список покупок')
+    y = top - PDF_LINE_HEIGHT * 2
+    for line in render_shopping_list(ingredients):
+        if y < PDF_MARGIN:
+            pdf.showPage()
+            pdf.setFont(PDF_FONT, PDF_FONT_SIZE)
+            y = top
+        pdf.drawString(PDF_MARGIN, y, line.rstrip('\n'))
+        y -= PDF_LINE_HEIGHT
+    pdf.save()
+    buffer.seek(0)
+    yield from iter(lambda: buffer.read(CHUNK_SIZE), b'')
+
+
+SHOPPING_LIST_FORMATS = {
+    'txt': (render_shopping_list, 'text/plain; charset=utf-8'),
+    'csv': (render_shopping_list_csv, 'text/csv; charset=utf-8'),
+    'pdf': (render_shopping_list_pdf, 'application/pdf'),
+}
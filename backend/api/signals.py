@@ -0,0 +1,70 @@
+""" Обработчики сигналов приложения api."""
+
+from django.contrib.auth.signals import user_logged_out
+from django.core.signals import request_started
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from recipes.models import Ingredients, IngredientsRecipes, Recipes, Tags
+from rest_framework.authtoken.models import Token
+from users.models import User
+
+from .authentication import token_cache
+from .cache import invalidate_catalog
+from .db import reset_health_checks
+from .matching import record_change
+from .metrics import registry
+
+
+@receiver(post_save, sender=Tags)
+@receiver(post_delete, sender=Tags)
+@receiver(post_save, sender=Ingredients)
+@receiver(post_delete, sender=Ingredients)
+def reset_catalog_cache(sender, **kwargs):
+    """ Сбрасывает кэш справочника при изменении его записей."""
+    invalidate_catalog(sender)
+
+
+@receiver(post_save, sender=Recipes)
+def update_recipes_matcher(sender, instance, **kwargs):
+    """ Обновляет индекс подбора, когда ингредиенты рецепта сохранены."""
+    transaction.on_commit(lambda: record_change(instance.pk))
+
+
+@receiver(post_delete, sender=Recipes)
+def remove_from_recipes_matcher(sender, instance, **kwargs):
+    transaction.on_commit(lambda: record_change(instance.pk))
+
+
+@receiver(post_save, sender=IngredientsRecipes)
+@receiver(post_delete, sender=IngredientsRecipes)
+def update_recipes_matcher_row(sender, instance, **kwargs):
+    """ Строку ингредиента можно изменить в обход рецепта, в админке."""
+    transaction.on_commit(lambda: record_change(instance.recipes_id))
+
+
+@receiver(post_delete, sender=Token)
+def forget_token(sender, instance, **kwargs):
+    """ Выход через djoser удаляет токен, удаляем его и из кэша."""
+    token_cache.invalidate([instance.key])
+
+
+@receiver(post_save, sender=User)
+@receiver(user_logged_out)
+def forget_user_tokens(sender, instance=None, user=None, **kwargs):
+    """ Смена пароля или деактивация сбрасывает кэш токенов."""
+    user = instance or user
+    if user is not None:
+        token_cache.invalidate_user(user.pk)
+
+
+@receiver(request_started)
+def reset_db_health_checks(sender, **kwargs):
+    reset_health_checks()
+
+
+@receiver(connection_created)
+def count_db_connection(sender, connection, **kwargs):
+    """ Число новых соединений показывает, работают ли постоянные."""
+    registry.connection_opened(connection.alias)
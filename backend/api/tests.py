@@ -0,0 +1,188 @@
+""" Бюджет SQL-запросов и планы запросов эндпоинтов рецептов."""
+
+from io import StringIO
+from unittest import skipUnless
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from recipes.models import (FavoriteResipes, Ingredients, IngredientsRecipes,
+                            Recipes, ShoppingCart, Tags)
+from rest_framework.test import APIClient
+from users.models import Subscriptions, User
+
+# Число запросов не зависит от размера страницы: count, страница
+# рецептов с авторами и флагами, тэги и ингредиенты.
+LIST_QUERIES = 4
+# Рецепт с автором и флагами, тэги и ингредиенты.
+DETAIL_QUERIES = 3
+# Ответ 304: count и страница без prefetch.
+NOT_MODIFIED_QUERIES = 2
+
+
+class RecipesQueryBudgetTest(TestCase):
+    """ Список и карточка рецепта укладываются в бюджет запросов."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user, cls.author = (
+            User.objects.create_user(
+                username=username, email=f'{username}@example.com',
+                password='password-12345', first_name='Имя',
+                last_name='Фамилия')
+            for username in ('user', 'author')
+        )
+        tags = [
+            Tags.objects.create(name=f'Тэг {index}', slug=f'tag{index}')
+            for index in range(3)
+        ]
+        ingredients = [
+            Ingredients.objects.create(
+                name=f'Ингредиент {index}', measurement_unit='г')
+            for index in range(5)
+        ]
+        cls.recipes = []
+        for index in range(12):
+            recipe = Recipes.objects.create(
+                author=(cls.author, cls.user)[index % 2],
+                name=f'Рецепт {index}', text='Описание', image='',
+                cooking_time=10)
+            recipe.tags.set(tags[:index % 3 + 1])
+            IngredientsRecipes.objects.bulk_create(
+                IngredientsRecipes(
+                    recipes=recipe, ingredients=ingredient, amount=index + 1)
+                for ingredient in ingredients[:index % 5 + 1]
+            )
+            cls.recipes.append(recipe)
+        Subscriptions.objects.create(user=cls.user, author=cls.author)
+        FavoriteResipes.objects.create(user=cls.user, recipes=cls.recipes[0])
+        ShoppingCart.objects.create(user=cls.user, recipes=cls.recipes[1])
+
+    def setUp(self):
+        self.anonymous = APIClient()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_list(self):
+        for client in (self.anonymous, self.client):
+            for limit in (6, 12):
+                with self.subTest(client=client, limit=limit):
+                    with self.assertNumQueries(LIST_QUERIES):
+                        response = client.get(f'/api/recipes/?limit={limit}')
+                    self.assertEqual(response.status_code, 200)
+                    self.assertEqual(len(response.data['results']), limit)
+
+    def test_list_cursor(self):
+        with self.assertNumQueries(LIST_QUERIES):
+            response = self.client.get('/api/recipes/?cursor=&limit=6')
+        self.assertEqual(response.status_code, 200)
+
+    def test_list_cursor_with_search(self):
+        """ При поиске курсор не меняет порядок по релевантности."""
+        older, newer = self.recipes[0], self.recipes[5]
+        older.name = 'Соус'
+        older.save()
+        newer.text = 'Подаётся с соусом'
+        newer.save()
+        response = self.client.get('/api/recipes/?cursor=&search=соус')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [recipe['id'] for recipe in response.data['results']],
+            [older.pk, newer.pk])
+
+    def test_list_not_modified(self):
+        response = self.client.get('/api/recipes/')
+        with self.assertNumQueries(NOT_MODIFIED_QUERIES):
+            response = self.client.get(
+                '/api/recipes/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_detail(self):
+        for client in (self.anonymous, self.client):
+            with self.subTest(client=client):
+                with self.assertNumQueries(DETAIL_QUERIES):
+                    response = client.get(
+                        f'/api/recipes/{self.recipes[0].pk}/')
+                self.assertEqual(response.status_code, 200)
+
+    def test_feed_without_count(self):
+        """ Страница ленты не считает всю ленту пользователя."""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/recipes/feed/?limit=3')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('count', response.data)
+        self.assertEqual(len(response.data['results']), 3)
+        self.assertIsNotNone(response.data['next'])
+        self.assertFalse(any(
+            'COUNT(' in query['sql'].upper() for query in queries))
+
+    def test_flags(self):
+        """ Флаги пользователя берутся из аннотаций без лишних запросов."""
+        response = self.client.get(f'/api/recipes/{self.recipes[0].pk}/')
+        self.assertTrue(response.data['is_favorited'])
+        self.assertFalse(response.data['is_in_shopping_cart'])
+        self.assertTrue(response.data['author']['is_subscribed'])
+
+
+class RecipesETagTest(TestCase):
+    """ ETag рецепта меняется при изменении его связей в обход API."""
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user(
+            username='author', email='author@example.com',
+            password='password-12345')
+        cls.tag, cls.other_tag = (
+            Tags.objects.create(name=name, slug=name)
+            for name in ('breakfast', 'dinner')
+        )
+        ingredient = Ingredients.objects.create(
+            name='Мука', measurement_unit='г')
+        cls.recipe = Recipes.objects.create(
+            author=author, name='Блины', text='Описание', image='',
+            cooking_time=30)
+        cls.recipe.tags.set([cls.tag])
+        cls.row = IngredientsRecipes.objects.create(
+            recipes=cls.recipe, ingredients=ingredient, amount=200)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.url = f'/api/recipes/{self.recipe.pk}/'
+        self.etag = self.client.get(self.url)['ETag']
+
+    def assert_modified(self):
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=self.etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], self.etag)
+        return response
+
+    def test_not_modified(self):
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=self.etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_ingredient_row_saved(self):
+        self.row.amount = 500
+        self.row.save()
+        response = self.assert_modified()
+        self.assertEqual(response.data['ingredients'][0]['amount'], 500)
+
+    def test_ingredient_row_deleted(self):
+        self.row.delete()
+        self.assert_modified()
+
+    def test_tags_added(self):
+        self.recipe.tags.add(self.other_tag)
+        self.assert_modified()
+
+    def test_tags_cleared_from_tag(self):
+        self.tag.recipes_set.clear()
+        self.assert_modified()
+
+
+@skipUnless(connection.vendor == 'postgresql', 'EXPLAIN только для Postgres')
+class QueryPlansTest(TestCase):
+    """ Частые запросы обслуживаются индексами."""
+
+    def test_query_plans(self):
+        call_command('check_query_plans', stdout=StringIO())
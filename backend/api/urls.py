@@ -1,13 +1,21 @@
 """ Urls."""
+from django.conf import settings
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
 from users.views import CustomUserViewSet, UsersListView, UsersViewSet
 
+from .async_views import async_patterns
 from .views import IngredientsViewSet, RecipesViewSet, TagsViewSet
 
 app_name = 'api'
 
+# Маршруты для чтения, которые под ASGI обслуживаются асинхронно.
+ASYNC_VIEW_NAMES = {
+    'tags-list', 'tags-detail', 'ingredients-list', 'ingredients-detail',
+    'recipes-list', 'recipes-detail', 'recipes-download-shopping-cart',
+}
+
 router = DefaultRouter()
 
 router.register('users', CustomUserViewSet, basename='users')
@@ -27,5 +35,8 @@ urlpatterns = [
         UsersViewSet.as_view(),
         name='subscribe'
     ),
-    path('', include(router.urls)),
+    path('', include(
+        async_patterns(router.urls, ASYNC_VIEW_NAMES)
+        if settings.ASYNC_VIEWS else router.urls
+    )),
 ]
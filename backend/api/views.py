@@ -1,24 +1,36 @@
 """ Настройка Вьюсетов."""
 from django_filters.rest_framework import DjangoFilterBackend
-from django.http import FileResponse
+from django.db.models import (BooleanField, Exists, OuterRef, Prefetch, Value,
+                              prefetch_related_objects)
+from django.http import StreamingHttpResponse
 from rest_framework import filters, permissions, status, viewsets
 from rest_framework.decorators import action
 from rest_framework.generics import get_object_or_404
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 
-from recipes.models import (FavoriteResipes, Ingredients, IngredientsRecipes,
-                            Recipes, ShoppingCart, Tags)
+from recipes.models import (FavoriteResipes, FeedRecipes, Ingredients,
+                            IngredientsRecipes, Recipes, ShoppingCart, Tags)
+from users.models import Subscriptions, User
+
+from .cache import CatalogCacheMixin, ConditionalGetMixin
 from .filters import IngredientsFilter, RecipesFilter
-from .pagination import LimitPageNumberPagination
+from .matching import recipes_matcher
+from .negotiation import IgnoreFormatContentNegotiation
+from .pagination import (FeedCursorPagination, LimitPageNumberPagination,
+                         RecipesCursorPagination)
 from .permissions import IsAuthorAdminOrReadOnly
+from .replicas import ReplicaReadMixin
+from .search import ingredients_index
 from .serializers import (FavoriteResipesSerializer, IngredientsSerializer,
-                          RecipesCreateSerializer, RecipesReadSerializer,
-                          RecipesShortSerializer, ShoppingCartSerializer,
-                          TagsSerializer)
+                          RecipesCreateSerializer, RecipesMatchSerializer,
+                          RecipesReadSerializer, RecipesShortSerializer,
+                          ShoppingCartSerializer, TagsSerializer)
+from .services import SHOPPING_LIST_FORMATS, get_shopping_list
 
 
-class TagsViewSet(viewsets.ReadOnlyModelViewSet):
+class TagsViewSet(ReplicaReadMixin, CatalogCacheMixin,
+                  viewsets.ReadOnlyModelViewSet):
     """ Вьюсет тэгов."""
     queryset = Tags.objects.all()
     serializer_class = TagsSerializer
@@ -26,7 +38,8 @@ class TagsViewSet(viewsets.ReadOnlyModelViewSet):
     pagination_class = None
 
 
-class IngredientsViewSet(viewsets.ReadOnlyModelViewSet):
+class IngredientsViewSet(ReplicaReadMixin, CatalogCacheMixin,
+                         viewsets.ReadOnlyModelViewSet):
     """ Вьюсет ингредиентов."""
     queryset = Ingredients.objects.all()
     serializer_class = IngredientsSerializer
@@ -35,8 +48,24 @@ class IngredientsViewSet(viewsets.ReadOnlyModelViewSet):
     filter_backends = (DjangoFilterBackend, filters.SearchFilter,)
     filterset_class = IngredientsFilter
 
+    def list(self, request, *args, **kwargs):
+        if request.query_params.get('name'):
+            return self.search(request)
+        return super().list(request, *args, **kwargs)
+
+    def search(self, request):
+        """ Ищет ингредиенты по индексу вместо запроса к базе.
+
+        Ответы не кэшируются: индекс в памяти отвечает быстрее кэша, а
+        запись на каждый префикс вытесняла бы из него остальные ключи.
+        """
+        return Response(
+            ingredients_index.search(request.query_params['name'])
+        )
 
-class RecipesViewSet(viewsets.ModelViewSet):
+
+class RecipesViewSet(ReplicaReadMixin, ConditionalGetMixin,
+                     viewsets.ModelViewSet):
     """ Вьюсет рецептов."""
     queryset = Recipes.objects.all()
     serializer_class = RecipesReadSerializer
@@ -44,6 +73,79 @@ class RecipesViewSet(viewsets.ModelViewSet):
     pagination_class = LimitPageNumberPagination
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipesFilter
+    etag_catalogs = (Tags, Ingredients)
+
+    @property
+    def paginator(self):
+        """ Курсорная пагинация включается параметром cursor.
+
+        Курсор задаёт порядок по дате, поэтому при поиске, где рецепты
+        отсортированы по релевантности, остаётся постраничная пагинация.
+        """
+        if not hasattr(self, '_paginator'):
+            params = self.request.query_params
+            cursor = RecipesCursorPagination.cursor_query_param
+            if (cursor in params
+                    and not params.get('search', '').strip()):
+                self._paginator = RecipesCursorPagination()
+            else:
+                self._paginator = self.pagination_class()
+        return self._paginator
+
+    def get_queryset(self):
+        """ Рецепты с подгруженными связями и флагами пользователя."""
+        user = self.request.user
+        if user.is_authenticated:
+            is_favorited = Exists(FavoriteResipes.objects.filter(
+                user=user, recipes=OuterRef('pk')))
+            is_in_shopping_cart = Exists(ShoppingCart.objects.filter(
+                user=user, recipes=OuterRef('pk')))
+            is_subscribed = Exists(Subscriptions.objects.filter(
+                user=user, author=OuterRef('pk')))
+        else:
+            is_favorited = is_in_shopping_cart = is_subscribed = Value(
+                False, output_field=BooleanField())
+        return Recipes.objects.defer('search_vector').prefetch_related(
+            'tags',
+            Prefetch(
+                'author',
+                queryset=User.objects.annotate(is_subscribed=is_subscribed)
+            ),
+            self.ingredients_prefetch(),
+        ).annotate(
+            is_favorited=is_favorited,
+            is_in_shopping_cart=is_in_shopping_cart,
+        )
+
+    def etag_queryset(self, queryset):
+        """ Рецепты с автором одним запросом, без prefetch."""
+        user = self.request.user
+        if user.is_authenticated:
+            author_is_subscribed = Exists(Subscriptions.objects.filter(
+                user=user, author=OuterRef('author')))
+        else:
+            author_is_subscribed = Value(False, output_field=BooleanField())
+        return queryset.prefetch_related(None).select_related(
+            'author').annotate(author_is_subscribed=author_is_subscribed)
+
+    def etag_values(self, recipe):
+        author = recipe.author
+        return (
+            recipe.pk, recipe.updated_at, author.username, author.first_name,
+            author.last_name, author.email, recipe.is_favorited,
+            recipe.is_in_shopping_cart, recipe.author_is_subscribed,
+        )
+
+    def prefetch_page(self, recipes):
+        for recipe in recipes:
+            recipe.author.is_subscribed = recipe.author_is_subscribed
+        prefetch_related_objects(recipes, 'tags', self.ingredients_prefetch())
+
+    @staticmethod
+    def ingredients_prefetch():
+        return Prefetch(
+            'amount_ingredients',
+            queryset=IngredientsRecipes.objects.select_related('ingredients'))
 
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
@@ -81,30 +183,100 @@ class RecipesViewSet(viewsets.ModelViewSet):
     @action(
         detail=False,
         methods=['GET'],
-        permission_classes=(IsAuthenticated,)
+        permission_classes=(IsAuthenticated,),
+        content_negotiation_class=IgnoreFormatContentNegotiation,
     )
     def download_shopping_cart(self, request):
-        """ Скачивает список покупок."""
-        user = request.user
-        purchases = ShoppingCart.objects.filter(user=user)
-        file = 'shopping-list.txt'
-        with open(file, 'w') as f:
-            shop_cart = dict()
-            for purchase in purchases:
-                ingredients = IngredientsRecipes.objects.filter(
-                    recipes=purchase.recipes.id
-                )
-                for r in ingredients:
-                    i = Ingredients.objects.get(pk=r.ingredients.id)
-                    point_name = f'{i.name} ({i.measurement_unit})'
-                    if point_name in shop_cart.keys():
-                        shop_cart[point_name] += r.amount
-                    else:
-                        shop_cart[point_name] = r.amount
-
-            for name, amount in shop_cart.items():
-                f.write(f'* {name} - {amount}\n')
-        return FileResponse(open(file, 'rb'), as_attachment=True)
+        """ Скачивает список покупок в формате txt, csv или pdf."""
+        export_format = request.query_params.get('format', 'txt')
+        if export_format not in SHOPPING_LIST_FORMATS:
+            return Response(
+                {'format': f'Доступные форматы: '
+                           f'{", ".join(SHOPPING_LIST_FORMATS)}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        render, content_type = SHOPPING_LIST_FORMATS[export_format]
+        response = StreamingHttpResponse(
+            render(get_shopping_list(request.user).iterator()),
+            content_type=content_type
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename="shopping-list.{export_format}"'
+        )
+        return response
+
+    @action(
+        detail=False,
+        methods=['GET'],
+        permission_classes=(IsAuthenticated,)
+    )
+    def feed(self, request):
+        """ Рецепты авторов, на которых подписан пользователь."""
+        paginator = FeedCursorPagination()
+        entries = paginator.paginate_queryset(
+            FeedRecipes.objects.filter(user=request.user), request, view=self)
+        recipes = self.get_queryset().in_bulk(
+            [entry.recipes_id for entry in entries])
+        serializer = RecipesReadSerializer(
+            [recipes[entry.recipes_id] for entry in entries
+             if entry.recipes_id in recipes],
+            many=True,
+            context=self.get_serializer_context(),
+        )
+        return paginator.get_paginated_response(serializer.data)
+
+    @action(detail=False, methods=['GET'])
+    def cookable(self, request):
+        """ Рецепты по ингредиентам, которые есть у пользователя.
+
+        ingredients — id ингредиентов через запятую, max_missing —
+        сколько ингредиентов рецепта может не хватать.
+        """
+        try:
+            ingredient_ids = {
+                int(value) for value in
+                request.query_params.get('ingredients', '').split(',')
+                if value.strip()
+            }
+            max_missing = request.query_params.get('max_missing')
+            max_missing = None if max_missing is None else int(max_missing)
+        except ValueError:
+            return Response(
+                {'error': 'ingredients и max_missing должны быть числами'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if not ingredient_ids:
+            return Response(
+                {'ingredients': 'Укажите хотя бы один ингредиент'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        paginator = self.pagination_class()
+        matches = paginator.paginate_queryset(
+            recipes_matcher.match(ingredient_ids, max_missing), request,
+            view=self)
+        recipes = self.get_queryset().in_bulk(
+            [recipe_id for recipe_id, _, _ in matches])
+        missing = {
+            recipe_id: recipes_matcher.missing(recipe_id, ingredient_ids)
+            for recipe_id, _, _ in matches
+        }
+        ingredients = Ingredients.objects.in_bulk(
+            {pk for pks in missing.values() for pk in pks})
+        page = []
+        for recipe_id, matched, total in matches:
+            if recipe_id not in recipes:
+                continue
+            recipe = recipes[recipe_id]
+            recipe.matched_ingredients = matched
+            recipe.total_ingredients = total
+            recipe.missing_ingredients = [
+                ingredients[pk] for pk in missing[recipe_id]
+                if pk in ingredients
+            ]
+            page.append(recipe)
+        serializer = RecipesMatchSerializer(
+            page, many=True, context=self.get_serializer_context())
+        return paginator.get_paginated_response(serializer.data)
 
     @action(detail=True, methods=['POST'],
             permission_classes=[IsAuthenticated])
@@ -0,0 +1,16 @@
+"""
+ASGI config for foodgram project.
+
+Запускается через gunicorn с воркерами uvicorn:
+gunicorn foodgram.asgi:application -k uvicorn.workers.UvicornWorker
+Включает асинхронные view для чтения (ASYNC_VIEWS).
+"""
+
+import os
+
+from django.core.asgi import get_asgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'foodgram.settings')
+os.environ.setdefault('ASYNC_VIEWS', 'True')
+
+application = get_asgi_application()
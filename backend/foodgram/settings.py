@@ -43,6 +43,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.metrics.QueryMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -84,10 +85,36 @@ DATABASES = {
         'USER': os.getenv('POSTGRES_USER', default='postgres'),
         'PASSWORD': os.getenv('POSTGRES_PASSWORD', default='postgres'),
         'HOST': os.getenv('DB_HOST', default='db'),
-        'PORT': os.getenv('DB_PORT', default='5432')
+        'PORT': os.getenv('DB_PORT', default='5432'),
+        # Соединение живёт между запросами, а перед повторным
+        # использованием проверяется (api.db.reset_health_checks).
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', default=60)),
+        'CONN_HEALTH_CHECKS': os.getenv(
+            'DB_CONN_HEALTH_CHECKS', default='True') == 'True',
+        # pgbouncer в режиме transaction не поддерживает серверные курсоры.
+        'DISABLE_SERVER_SIDE_CURSORS': os.getenv(
+            'DB_DISABLE_SERVER_SIDE_CURSORS', default='False') == 'True',
     }
 }
 
+# Реплика для чтения: хост или, для проверки на SQLite, копия файла базы.
+# Остальные параметры совпадают с основной базой.
+if os.getenv('DB_REPLICA_HOST') or os.getenv('DB_REPLICA_NAME'):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'HOST': os.getenv('DB_REPLICA_HOST',
+                          default=DATABASES['default']['HOST']),
+        'NAME': os.getenv('DB_REPLICA_NAME',
+                          default=DATABASES['default']['NAME']),
+        'TEST': {'MIRROR': 'default'},
+    }
+REPLICA_DATABASE = 'replica' if 'replica' in DATABASES else None
+DATABASE_ROUTERS = ['api.replicas.ReplicaRouter']
+# Сколько секунд после записи пользователь читает из основной базы.
+# Должно превышать обычное отставание реплики.
+REPLICA_PIN_SECONDS = int(os.getenv('REPLICA_PIN_SECONDS', default=5))
+REPLICA_PIN_ALIAS = 'default'
+
 # DATABASES = {
 #     'default': {
 #         'ENGINE': 'django.db.backends.sqlite3',
@@ -95,6 +122,26 @@ DATABASES = {
 #     }
 # }
 
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND',
+            default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', default='foodgram'),
+    }
+}
+
+# Кэш справочников тегов и ингредиентов. При нескольких воркерах
+# gunicorn для мгновенного сброса нужен общий бэкенд, например
+# CACHE_BACKEND=django.core.cache.backends.memcached.PyMemcacheCache.
+CATALOG_CACHE_ALIAS = 'default'
+CATALOG_CACHE_TIMEOUT = int(os.getenv('CATALOG_CACHE_TIMEOUT', default=300))
+# Индекс подбора рецептов перестраивается не реже, чем раз в столько
+# секунд. С кэшем в памяти процесса изменения из других воркеров доходят
+# только так.
+MATCHER_REBUILD_SECONDS = int(
+    os.getenv('MATCHER_REBUILD_SECONDS', default=300))
+
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
 
@@ -142,10 +189,51 @@ REST_FRAMEWORK = {
     ],
 
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachedTokenAuthentication',
     ]
 }
 
+# Кэш токенов: сколько секунд и сколько токенов держать в памяти
+# процесса и, если задан, общий кэш из CACHES для всех воркеров.
+TOKEN_CACHE_TTL = int(os.getenv('TOKEN_CACHE_TTL', default=30))
+TOKEN_CACHE_SIZE = 10000
+TOKEN_CACHE_ALIAS = os.getenv('TOKEN_CACHE_ALIAS') or None
+
+# Как считать count при курсорной пагинации рецептов:
+# exact — COUNT(*), estimate — оценка планировщика Postgres, none — не считать.
+RECIPES_PAGINATION_COUNT = os.getenv(
+    'RECIPES_PAGINATION_COUNT', default='exact')
+
+# Сколько секунд nginx и браузеры могут отдавать рецепты анонимам
+# без повторной проверки.
+RECIPES_CACHE_MAX_AGE = int(os.getenv('RECIPES_CACHE_MAX_AGE', default=60))
+
+# Конфигурация полнотекстового поиска рецептов в Postgres.
+RECIPES_SEARCH_CONFIG = 'russian'
+
+# Сколько последних рецептов автора попадает в ленту при подписке,
+# None — все рецепты.
+FEED_BACKFILL_LIMIT = 1000
+
+# Асинхронные view для чтения: включаются в foodgram/asgi.py. Синхронный
+# код view выполняется в пуле из ASYNC_VIEW_THREADS потоков, у каждого
+# потока своё соединение с базой.
+ASYNC_VIEWS = os.getenv('ASYNC_VIEWS', default='False') == 'True'
+ASYNC_VIEW_THREADS = int(os.getenv('ASYNC_VIEW_THREADS', default=8))
+
+# Бюджет SQL-запросов на один запрос к view: при превышении в лог пишется
+# предупреждение. Ключ — метод и имя view из resolver_match, None — без
+# бюджета. Остальные методы и view, в том числе запись, получают
+# QUERY_BUDGET_DEFAULT.
+QUERY_BUDGET_DEFAULT = int(os.getenv('QUERY_BUDGET_DEFAULT', default=20))
+QUERY_BUDGETS = {
+    'GET api:recipes-list': 8,
+    'GET api:recipes-detail': 8,
+    'GET api:subscriptions': 6,
+    'GET api:tags-list': 2,
+    'GET api:ingredients-list': 2,
+}
+
 DJOSER = {
     'SERIALIZERS': {
         'user': 'users.serializers.CustomUserSerializer',
@@ -160,3 +248,15 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'static')
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+
+# Изображения рецептов: предельный размер загрузки (как client_max_body_size
+# в nginx), число фоновых потоков для версий (0 — обрабатывать сразу)
+# и формат версий.
+MAX_IMAGE_UPLOAD_SIZE = 10 * 1024 * 1024
+IMAGE_WORKERS = int(os.getenv('IMAGE_WORKERS', default=2))
+IMAGE_RENDITION_FORMAT = os.getenv('IMAGE_RENDITION_FORMAT', default='WEBP')
+IMAGE_RENDITION_QUALITY = 85
+
+PDF_FONT_PATH = os.getenv(
+    'PDF_FONT_PATH',
+    default='/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf')
@@ -18,7 +18,9 @@ class RecipeIngredientInline(admin.TabularInline):
 
 class RecipesAdmin(admin.ModelAdmin):
     """ Модель Recipes в интерфейсе админ панели."""
-    list_display = ('author', 'name', 'cooking_time')
+    list_display = (
+        'author', 'name', 'cooking_time', 'favorites_count', 'in_carts_count'
+    )
     search_fields = ('name', 'author', 'tags')
     list_filter = ('author', 'name', 'tags')
     inlines = (RecipeIngredientInline, )
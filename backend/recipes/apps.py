@@ -6,3 +6,6 @@ class RecipesConfig(AppConfig):
     """ Создание приложения Recipes."""
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'recipes'
+
+    def ready(self):
+        from . import signals  # noqa: F401
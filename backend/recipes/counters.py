@@ -0,0 +1,63 @@
+""" Денормализованные счётчики рецептов и пользователей."""
+
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+from users.models import Subscriptions, User
+
+from .models import FavoriteResipes, Recipes, ShoppingCart
+
+# Модель со счётчиком, поле счётчика, считаемая модель и её внешний ключ.
+COUNTERS = (
+    (Recipes, 'favorites_count', FavoriteResipes, 'recipes'),
+    (Recipes, 'in_carts_count', ShoppingCart, 'recipes'),
+    (User, 'recipes_count', Recipes, 'author'),
+    (User, 'subscribers_count', Subscriptions, 'author'),
+)
+
+
+def change_counter(model, pk, field, delta):
+    """ Атомарно изменяет счётчик на delta одним UPDATE.
+
+    Счётчик не опускается ниже нуля: после миграции или массовых
+    изменений он может разойтись с реальностью до rebuild_counters,
+    и действие пользователя из-за этого падать не должно.
+    """
+    model.objects.filter(pk=pk).update(
+        **{field: Greatest(F(field) + delta, 0)})
+
+
+def true_count(related_model, fk):
+    """ Подзапрос с реальным числом связанных записей."""
+    return Coalesce(
+        Subquery(
+            related_model.objects
+            .filter(**{fk: OuterRef('pk')})
+            .order_by()
+            .values(fk)
+            .annotate(total=Count('pk'))
+            .values('total')
+        ),
+        0
+    )
+
+
+def rebuild_counters():
+    """ Пересчитывает все счётчики, по одному UPDATE на счётчик."""
+    return {
+        f'{model.__name__}.{field}': model.objects.update(
+            **{field: true_count(related_model, fk)})
+        for model, field, related_model, fk in COUNTERS
+    }
+
+
+def find_drift():
+    """ Записи, у которых счётчик расходится с реальным числом."""
+    drift = {}
+    for model, field, related_model, fk in COUNTERS:
+        queryset = model.objects.annotate(
+            true_value=true_count(related_model, fk)
+        ).exclude(**{field: F('true_value')})
+        rows = list(queryset.values_list('pk', field, 'true_value'))
+        if rows:
+            drift[f'{model.__name__}.{field}'] = rows
+    return drift
@@ -0,0 +1,51 @@
+""" Лента рецептов от авторов, на которых подписан пользователь."""
+
+from django.conf import settings
+from users.models import Subscriptions
+
+from .models import FeedRecipes, Recipes
+
+BATCH_SIZE = 1000
+
+
+def fan_out(recipe):
+    """ Добавляет новый рецепт в ленты всех подписчиков автора."""
+    subscribers = Subscriptions.objects.filter(
+        author_id=recipe.author_id).values_list('user_id', flat=True)
+    FeedRecipes.objects.bulk_create(
+        (FeedRecipes(user_id=user_id, recipes_id=recipe.pk,
+                     pub_date=recipe.pub_date)
+         for user_id in subscribers.iterator()),
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def backfill(user_id, author_id):
+    """ Добавляет в ленту последние рецепты автора после подписки."""
+    recipes = Recipes.objects.filter(author_id=author_id).order_by(
+        '-pub_date', '-id').values_list('id', 'pub_date')
+    limit = settings.FEED_BACKFILL_LIMIT
+    if limit is not None:
+        recipes = recipes[:limit]
+    FeedRecipes.objects.bulk_create(
+        (FeedRecipes(user_id=user_id, recipes_id=pk, pub_date=pub_date)
+         for pk, pub_date in recipes),
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def remove_author(user_id, author_id):
+    """ Убирает из ленты рецепты автора после отписки."""
+    FeedRecipes.objects.filter(
+        user_id=user_id, recipes__author_id=author_id).delete()
+
+
+def rebuild_feed():
+    """ Заново собирает все ленты по текущим подпискам."""
+    FeedRecipes.objects.all().delete()
+    subscriptions = Subscriptions.objects.values_list('user_id', 'author_id')
+    for user_id, author_id in subscriptions.iterator():
+        backfill(user_id, author_id)
+    return FeedRecipes.objects.count()
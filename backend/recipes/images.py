@@ -0,0 +1,130 @@
+""" Обработка изображений рецептов в фоновом пуле потоков."""
+
+import io
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connection
+from django.utils import timezone
+from PIL import Image, ImageOps, features
+
+logger = logging.getLogger(__name__)
+
+RENDITIONS_DIR = 'recipes/renditions/'
+RENDITIONS = {
+    'image_thumbnail': (240, 240),
+    'image_card': (960, 960),
+}
+
+METADATA_KEYS = {'exif', 'xmp', 'XML:com.adobe.xmp', 'comment'}
+EXIF_ORIENTATION = 0x0112
+
+executor = None
+
+
+def rendition_prefix(image_name, field):
+    """ Начало имени файла версии изображения для данного оригинала."""
+    stem = os.path.splitext(os.path.basename(image_name))[0]
+    return f'{RENDITIONS_DIR}{stem}_{field}'
+
+
+def renditions_up_to_date(recipe):
+    return all(
+        getattr(recipe, field).name.startswith(
+            rendition_prefix(recipe.image.name, field))
+        for field in RENDITIONS
+    )
+
+
+def get_rendition_format():
+    if settings.IMAGE_RENDITION_FORMAT == 'WEBP' and features.check('webp'):
+        return 'WEBP', 'webp'
+    return 'JPEG', 'jpg'
+
+
+def encode(image, image_format):
+    if image_format == 'JPEG' and image.mode != 'RGB':
+        image = image.convert('RGB')
+    buffer = io.BytesIO()
+    image.save(
+        buffer, format=image_format,
+        quality=settings.IMAGE_RENDITION_QUALITY)
+    return buffer.getvalue()
+
+
+def strip_metadata(recipe, image):
+    """ Перезаписывает оригинал без EXIF и прочих метаданных.
+
+    Поворот из EXIF применяется к пикселям, чтобы не потерять ориентацию.
+    """
+    exif = image.getexif()
+    if not exif and not METADATA_KEYS.intersection(image.info):
+        return image
+    if exif.get(EXIF_ORIENTATION, 1) == 1:
+        clean = image
+        options = {'quality': 'keep'} if image.format == 'JPEG' else {}
+    else:
+        clean = ImageOps.exif_transpose(image)
+        options = {'quality': settings.IMAGE_RENDITION_QUALITY}
+    for key in METADATA_KEYS:
+        clean.info.pop(key, None)
+    buffer = io.BytesIO()
+    clean.save(buffer, format=image.format, **options)
+    with recipe.image.storage.open(recipe.image.name, 'wb') as file:
+        file.write(buffer.getvalue())
+    return clean
+
+
+def make_renditions(recipe_id):
+    """ Создаёт уменьшенные версии изображения рецепта."""
+    from .models import Recipes
+
+    recipe = Recipes.objects.filter(pk=recipe_id).first()
+    if recipe is None or not recipe.image:
+        return
+    with recipe.image.open('rb') as file:
+        image = Image.open(file)
+        image.load()
+    image = strip_metadata(recipe, image)
+    image_format, ext = get_rendition_format()
+    storage = recipe.image.storage
+    updates = {}
+    for field, size in RENDITIONS.items():
+        rendition = image.copy()
+        rendition.thumbnail(size)
+        updates[field] = storage.save(
+            f'{rendition_prefix(recipe.image.name, field)}.{ext}',
+            ContentFile(encode(rendition, image_format)))
+    # Если за время обработки изображение заменили, версии не сохраняем.
+    # update() не трогает auto_now, а от updated_at зависит ETag рецепта.
+    Recipes.objects.filter(pk=recipe_id, image=recipe.image.name).update(
+        **updates, updated_at=timezone.now())
+
+
+def run_in_worker(recipe_id):
+    try:
+        make_renditions(recipe_id)
+    except Exception:
+        logger.exception(
+            'Не удалось обработать изображение рецепта %s', recipe_id)
+    finally:
+        connection.close()
+
+
+def schedule_renditions(recipe_id):
+    """ Ставит обработку изображения в очередь пула потоков.
+
+    При IMAGE_WORKERS = 0 изображение обрабатывается сразу.
+    """
+    global executor
+    if not settings.IMAGE_WORKERS:
+        make_renditions(recipe_id)
+        return
+    if executor is None:
+        executor = ThreadPoolExecutor(
+            max_workers=settings.IMAGE_WORKERS,
+            thread_name_prefix='recipe-images')
+    executor.submit(run_in_worker, recipe_id)
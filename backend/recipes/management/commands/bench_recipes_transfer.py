@@ -0,0 +1,93 @@
+''' Замер скорости выгрузки и загрузки рецептов.'''
+
+import json
+import os
+import random
+import tempfile
+import time
+
+from django.core.management import BaseCommand
+from django.db import transaction
+from recipes.models import Ingredients
+from recipes.transfer import CHUNK_SIZE, RecipesImporter, export_recipes
+
+TAGS = (
+    {'slug': 'breakfast', 'name': 'Завтрак', 'color': '#E26C2D'},
+    {'slug': 'lunch', 'name': 'Обед', 'color': '#49B64E'},
+    {'slug': 'dinner', 'name': 'Ужин', 'color': '#8775D2'},
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Генерирует синтетические рецепты, загружает и выгружает их, '
+        'показывает рецепты в секунду. Данные откатываются.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--recipes', type=int, default=100_000,
+            help='Сколько рецептов сгенерировать.')
+        parser.add_argument(
+            '--authors', type=int, default=1000,
+            help='Сколько авторов сгенерировать.')
+        parser.add_argument(
+            '--batch-size', type=int, default=CHUNK_SIZE,
+            help='Размер пачки при загрузке и выгрузке.')
+        parser.add_argument(
+            '--keep', action='store_true',
+            help='Не откатывать загруженные данные.')
+
+    def handle(self, *args, **options):
+        catalog = list(
+            Ingredients.objects.values_list('name', 'measurement_unit'))
+        if not catalog:
+            catalog = [(f'ингредиент {index}', 'г') for index in range(2000)]
+        with tempfile.TemporaryDirectory() as directory:
+            source = os.path.join(directory, 'source.jsonl')
+            with open(source, 'w', encoding='utf-8') as file:
+                self.generate(file, options['recipes'], options['authors'],
+                              catalog)
+            with transaction.atomic():
+                start = time.perf_counter()
+                with open(source, 'r', encoding='utf-8') as file:
+                    total = RecipesImporter(options['batch_size']).run(file)
+                self.report('Загрузка', total, time.perf_counter() - start)
+                start = time.perf_counter()
+                with open(os.path.join(directory, 'export.jsonl'), 'w',
+                          encoding='utf-8') as file:
+                    total = export_recipes(file, options['batch_size'])
+                self.report('Выгрузка', total, time.perf_counter() - start)
+                transaction.set_rollback(not options['keep'])
+
+    @staticmethod
+    def generate(file, count, authors, catalog):
+        randomizer = random.Random(0)
+        for index in range(count):
+            author = index % authors
+            file.write(json.dumps({
+                'author': {
+                    'username': f'bench_author_{author}',
+                    'email': f'bench_author_{author}@example.com',
+                    'first_name': 'Автор',
+                    'last_name': str(author),
+                },
+                'name': f'Рецепт {index}',
+                'text': 'Описание рецепта',
+                'cooking_time': randomizer.randint(1, 180),
+                'pub_date': '2023-01-01T00:00:00+00:00',
+                'image': None,
+                'tags': randomizer.sample(TAGS, randomizer.randint(1, 2)),
+                'ingredients': [
+                    {'name': name, 'measurement_unit': unit,
+                     'amount': randomizer.randint(1, 500)}
+                    for name, unit in randomizer.sample(catalog, 8)
+                ],
+            }, ensure_ascii=False))
+            file.write('\n')
+
+    def report(self, stage, total, elapsed):
+        self.stdout.write(
+            f'{stage}: {total} рецептов за {elapsed:.2f} с, '
+            f'{total / max(elapsed, 1e-9):.0f} рецептов/с'
+        )
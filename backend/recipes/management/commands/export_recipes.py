@@ -0,0 +1,31 @@
+''' Выгрузка рецептов в JSON Lines.'''
+
+import sys
+
+from django.core.management import BaseCommand
+from recipes.transfer import CHUNK_SIZE, export_recipes
+
+
+class Command(BaseCommand):
+    help = 'Выгружает рецепты со связями, по одному JSON-объекту на строку.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', nargs='?', default='-',
+            help='Файл для выгрузки, по умолчанию стандартный вывод.')
+        parser.add_argument(
+            '--chunk-size', type=int, default=CHUNK_SIZE,
+            help='Сколько рецептов читать из базы за раз.')
+        parser.add_argument(
+            '--with-images', action='store_true',
+            help='Встроить изображения в выгрузку в base64.')
+
+    def handle(self, *args, **options):
+        if options['path'] == '-':
+            total = export_recipes(
+                sys.stdout, options['chunk_size'], options['with_images'])
+        else:
+            with open(options['path'], 'w', encoding='utf-8') as file:
+                total = export_recipes(
+                    file, options['chunk_size'], options['with_images'])
+        self.stderr.write(self.style.SUCCESS(f'Выгружено рецептов: {total}'))
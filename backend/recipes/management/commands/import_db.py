@@ -1,27 +1,158 @@
 ''' Подгружаем список ингридиентов.'''
 
 import csv
+import io
+import json
+import os
+import time
+from itertools import islice
 
+from api.cache import invalidate_catalog
 from django.conf import settings
-from django.core.management import BaseCommand
+from django.core.management import BaseCommand, CommandError
+from django.db import connection, transaction
 from recipes.models import Ingredients
 
 TABLES = {
     Ingredients: 'ingredients.csv',
 }
+FIELDS = ('name', 'measurement_unit')
+BATCH_SIZE = 5000
+READ_SIZE = 64 * 1024
+
+
+def read_csv(file):
+    for row in csv.reader(file):
+        if row:
+            yield row[0], row[1]
+
+
+def read_json(file):
+    """ Построчно читает JSON-массив объектов, не загружая файл целиком.
+
+    Файл без закрывающей скобки массива считается обрезанным.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ''
+    started = closed = False
+    for chunk in iter(lambda: file.read(READ_SIZE), ''):
+        buffer += chunk
+        position = 0
+        while True:
+            while position < len(buffer) and buffer[position] in ' \t\r\n,[':
+                started = started or buffer[position] == '['
+                position += 1
+            if position >= len(buffer):
+                break
+            if not started:
+                raise CommandError('Ожидался JSON-массив')
+            if buffer[position] == ']':
+                closed = True
+                break
+            try:
+                item, position = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                break
+            yield item['name'], item['measurement_unit']
+        buffer = buffer[position:]
+    if not closed or buffer.strip() != ']':
+        raise CommandError('JSON-файл обрезан или повреждён')
+
+
+READERS = {
+    'csv': read_csv,
+    'json': read_json,
+}
+
+
+def batches(rows, size):
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, size))
+        if not batch:
+            return
+        yield batch
 
 
 class Command(BaseCommand):
-    def handle(self, *args, **kwargs):
+    help = (
+        'Загружает ингредиенты из CSV или JSON пачками. Повторный запуск '
+        'пропускает уже существующие ингредиенты.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', nargs='?',
+            help='Файл с ингредиентами, по умолчанию data/ingredients.csv.')
+        parser.add_argument(
+            '--format', choices=READERS,
+            help='Формат файла, по умолчанию определяется по расширению.')
+        parser.add_argument(
+            '--batch-size', type=int, default=BATCH_SIZE,
+            help='Количество строк в одной пачке.')
+        parser.add_argument(
+            '--copy', action='store_true',
+            help='Загружать через COPY во временную таблицу (Postgres).')
+
+    def handle(self, *args, **options):
         for model, csv_files in TABLES.items():
-            with open(
-                f'{settings.BASE_DIR}/data/{csv_files}',
-                'r',
-                encoding='utf-8',
-            ) as csv_file:
-                reader = csv.reader(csv_file)
-                model.objects.bulk_create(
-                    model(name=data[0], measurement_unit=data[1])
-                    for data in reader
-                )
+            path = options['path'] or f'{settings.BASE_DIR}/data/{csv_files}'
+            file_format = (
+                options['format'] or os.path.splitext(path)[1].lstrip('.'))
+            if file_format not in READERS:
+                raise CommandError(f'Неизвестный формат файла: {path}')
+            if options['copy'] and connection.vendor != 'postgresql':
+                raise CommandError('--copy доступен только для Postgres')
+            load = self.copy_rows if options['copy'] else self.insert_rows
+            before = model.objects.count()
+            start = time.perf_counter()
+            with open(path, 'r', encoding='utf-8') as file:
+                with transaction.atomic():
+                    total = load(
+                        model, READERS[file_format](file),
+                        options['batch_size'])
+            elapsed = time.perf_counter() - start
+            invalidate_catalog(model)
+            created = model.objects.count() - before
+            self.stdout.write(
+                f'{model.__name__}: прочитано {total}, добавлено {created}, '
+                f'{elapsed:.2f} с, {total / max(elapsed, 1e-9):.0f} строк/с'
+            )
         self.stdout.write(self.style.SUCCESS('Все данные загружены'))
+
+    @staticmethod
+    def insert_rows(model, rows, batch_size):
+        total = 0
+        for batch in batches(rows, batch_size):
+            model.objects.bulk_create(
+                (model(**dict(zip(FIELDS, row))) for row in batch),
+                ignore_conflicts=True,
+            )
+            total += len(batch)
+        return total
+
+    @staticmethod
+    def copy_rows(model, rows, batch_size):
+        """ COPY во временную таблицу и INSERT ... ON CONFLICT DO NOTHING."""
+        table = connection.ops.quote_name(model._meta.db_table)
+        columns = ', '.join(connection.ops.quote_name(f) for f in FIELDS)
+        staging_columns = ', '.join(
+            f'{connection.ops.quote_name(f)} text' for f in FIELDS)
+        total = 0
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'CREATE TEMP TABLE import_staging ({staging_columns}) '
+                f'ON COMMIT DROP')
+            for batch in batches(rows, batch_size):
+                buffer = io.StringIO()
+                csv.writer(buffer).writerows(batch)
+                buffer.seek(0)
+                cursor.copy_expert(
+                    f'COPY import_staging ({columns}) '
+                    f'FROM STDIN WITH (FORMAT csv)', buffer)
+                total += len(batch)
+            cursor.execute(
+                f'INSERT INTO {table} ({columns}) '
+                f'SELECT DISTINCT {columns} FROM import_staging '
+                f'ON CONFLICT DO NOTHING')
+        return total
@@ -0,0 +1,43 @@
+''' Загрузка рецептов из JSON Lines.'''
+
+import time
+
+from api.cache import invalidate_catalog
+from api.matching import invalidate_matcher
+from django.core.management import BaseCommand
+from recipes.counters import rebuild_counters
+from recipes.feed import rebuild_feed
+from recipes.models import Ingredients, Tags
+from recipes.search import update_search_vectors
+from recipes.transfer import CHUNK_SIZE, RecipesImporter
+
+
+class Command(BaseCommand):
+    help = (
+        'Загружает рецепты, выгруженные export_recipes. Недостающие '
+        'авторы, теги и ингредиенты создаются.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл JSON Lines.')
+        parser.add_argument(
+            '--batch-size', type=int, default=CHUNK_SIZE,
+            help='Сколько рецептов вставлять за раз.')
+
+    def handle(self, *args, **options):
+        importer = RecipesImporter(options['batch_size'])
+        start = time.perf_counter()
+        with open(options['path'], 'r', encoding='utf-8') as file:
+            total = importer.run(file)
+        rebuild_counters()
+        rebuild_feed()
+        update_search_vectors()
+        invalidate_matcher()
+        if importer.created_catalog:
+            invalidate_catalog(Tags)
+            invalidate_catalog(Ingredients)
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            f'Загружено рецептов: {total}, {elapsed:.2f} с, '
+            f'{total / max(elapsed, 1e-9):.0f} рецептов/с'
+        ))
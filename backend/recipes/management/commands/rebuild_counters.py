@@ -0,0 +1,37 @@
+''' Пересчёт и проверка денормализованных счётчиков.'''
+
+from django.core.management import BaseCommand, CommandError
+from django.db import transaction
+from recipes.counters import find_drift, rebuild_counters
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает счётчики избранного, корзин, рецептов и подписчиков. '
+        'С --check только сравнивает их с реальными значениями.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check', action='store_true',
+            help='Найти расхождения без пересчёта.')
+
+    def handle(self, *args, **options):
+        if options['check']:
+            drift = find_drift()
+            for counter, rows in drift.items():
+                self.stdout.write(self.style.WARNING(
+                    f'{counter}: расхождений {len(rows)}'))
+                for pk, stored, actual in rows[:10]:
+                    self.stdout.write(
+                        f'  id={pk}: сохранено {stored}, на самом деле '
+                        f'{actual}')
+            if drift:
+                raise CommandError('Счётчики расходятся с данными')
+            self.stdout.write(self.style.SUCCESS('Счётчики совпадают'))
+            return
+        with transaction.atomic():
+            updated = rebuild_counters()
+        for counter, rows in updated.items():
+            self.stdout.write(f'{counter}: обновлено строк {rows}')
+        self.stdout.write(self.style.SUCCESS('Счётчики пересчитаны'))
@@ -0,0 +1,19 @@
+''' Пересборка лент подписок.'''
+
+from django.core.management import BaseCommand
+from django.db import transaction
+from recipes.feed import rebuild_feed
+
+
+class Command(BaseCommand):
+    help = (
+        'Заново собирает ленты пользователей по текущим подпискам. '
+        'Нужна после массовой загрузки рецептов или подписок в обход '
+        'сигналов.'
+    )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            total = rebuild_feed()
+        self.stdout.write(self.style.SUCCESS(
+            f'Лента пересобрана, записей: {total}'))
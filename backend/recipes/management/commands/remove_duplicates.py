@@ -0,0 +1,67 @@
+''' Удаление повторяющихся строк перед созданием уникальных ограничений.'''
+
+from django.core.management import BaseCommand, CommandError
+from django.db import connection, transaction
+from recipes.counters import rebuild_counters
+from recipes.models import FavoriteResipes, IngredientsRecipes, ShoppingCart
+from users.models import Subscriptions
+
+# Модели и поля их уникальных ограничений.
+UNIQUE_FIELDS = (
+    (FavoriteResipes, ('user', 'recipes')),
+    (ShoppingCart, ('user', 'recipes')),
+    (Subscriptions, ('user', 'author')),
+    (IngredientsRecipes, ('recipes', 'ingredients')),
+)
+
+
+def duplicates_sql(model, fields, select):
+    """ SQL для строк, повторяющих более раннюю строку с теми же полями."""
+    meta = model._meta
+    table = connection.ops.quote_name(meta.db_table)
+    pk = connection.ops.quote_name(meta.pk.column)
+    columns = ', '.join(
+        connection.ops.quote_name(meta.get_field(field).column)
+        for field in fields)
+    where = (
+        f'{pk} NOT IN (SELECT MIN({pk}) FROM {table} GROUP BY {columns})')
+    if select:
+        return f'SELECT COUNT(*) FROM {table} WHERE {where}'
+    return f'DELETE FROM {table} WHERE {where}'
+
+
+class Command(BaseCommand):
+    help = (
+        'Удаляет повторяющиеся записи избранного, корзин, подписок и '
+        'ингредиентов рецептов, оставляя самую раннюю, и пересчитывает '
+        'счётчики. Запускается перед migrate, который создаёт уникальные '
+        'ограничения. С --check только считает повторы.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check', action='store_true',
+            help='Посчитать повторы без удаления.')
+
+    def handle(self, *args, **options):
+        found = 0
+        with transaction.atomic(), connection.cursor() as cursor:
+            for model, fields in UNIQUE_FIELDS:
+                # Удаляем в обход ORM: сигналы удаления убрали бы из ленты
+                # рецепты автора, подписка на которого остаётся.
+                cursor.execute(duplicates_sql(
+                    model, fields, select=options['check']))
+                rows = (
+                    cursor.fetchone()[0] if options['check']
+                    else cursor.rowcount)
+                found += rows
+                self.stdout.write(
+                    f'{model._meta.db_table}: повторов {rows}')
+            if found and not options['check']:
+                rebuild_counters()
+        if options['check']:
+            if found:
+                raise CommandError('В таблицах есть повторяющиеся записи')
+            self.stdout.write(self.style.SUCCESS('Повторов нет'))
+            return
+        self.stdout.write(self.style.SUCCESS(f'Удалено повторов: {found}'))
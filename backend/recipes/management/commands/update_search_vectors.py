@@ -0,0 +1,16 @@
+''' Пересчёт поисковых векторов рецептов.'''
+
+from django.core.management import BaseCommand
+from recipes.search import update_search_vectors
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает поле search_vector всех рецептов. Нужна после '
+        'миграции и массовых изменений в обход сигналов (Postgres).'
+    )
+
+    def handle(self, *args, **options):
+        updated = update_search_vectors()
+        self.stdout.write(self.style.SUCCESS(
+            f'Обновлено рецептов: {updated}'))
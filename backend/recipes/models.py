@@ -1,5 +1,7 @@
 """ Создание моделей."""
 
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import models
 from django.db.models import UniqueConstraint
@@ -44,6 +46,15 @@ class Ingredients(models.Model):
         return f'{self.name}, {self.measurement_unit}'
 
 
+class SearchVectorIndex(GinIndex):
+    """ GIN-индекс в Postgres, обычный индекс в остальных базах."""
+    def create_sql(self, model, schema_editor, using='', **kwargs):
+        if schema_editor.connection.vendor != 'postgresql':
+            return models.Index.create_sql(
+                self, model, schema_editor, using=using, **kwargs)
+        return super().create_sql(model, schema_editor, using, **kwargs)
+
+
 class Recipes(models.Model):
     """ Настройка модели Рецепты."""
     author = models.ForeignKey(
@@ -57,6 +68,16 @@ class Recipes(models.Model):
         null=True,
         blank=False,
         verbose_name='Изображение')
+    image_thumbnail = models.ImageField(
+        upload_to='recipes/renditions/',
+        blank=True,
+        editable=False,
+        verbose_name='Миниатюра изображения')
+    image_card = models.ImageField(
+        upload_to='recipes/renditions/',
+        blank=True,
+        editable=False,
+        verbose_name='Изображение для ленты')
     text = models.TextField(max_length=1500, verbose_name='Описание')
     ingredients = models.ManyToManyField(
         Ingredients,
@@ -84,9 +105,38 @@ class Recipes(models.Model):
     pub_date = models.DateTimeField(
         verbose_name='Дата публикации',
         auto_now_add=True)
+    updated_at = models.DateTimeField(
+        verbose_name='Дата изменения',
+        auto_now=True)
+    favorites_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='В избранном')
+    in_carts_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='В корзинах')
+    search_vector = SearchVectorField(
+        null=True,
+        editable=False,
+        verbose_name='Поисковый вектор')
 
     class Meta:
-        ordering = ('-pub_date',)
+        ordering = ('-pub_date', '-id')
+        indexes = [
+            SearchVectorIndex(
+                fields=('search_vector',),
+                name='recipes_search_vector_idx'
+            ),
+            models.Index(
+                fields=('-pub_date', '-id'),
+                name='recipes_pub_date_id_idx'
+            ),
+            models.Index(
+                fields=('-favorites_count', '-id'),
+                name='recipes_favorites_count_idx'
+            ),
+        ]
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
 
@@ -156,6 +206,12 @@ class FavoriteResipes(models.Model):
     class Meta:
         verbose_name = 'Избранное'
         verbose_name_plural = 'Избранные'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'recipes'],
+                name='unique_favorite_recipes',
+            )
+        ]
 
     def __str__(self):
         return f'{self.user} добавил "{self.recipes}" в Избранное'
@@ -179,6 +235,53 @@ class ShoppingCart(models.Model):
     class Meta:
         verbose_name = 'Покупка'
         verbose_name_plural = 'Покупки'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'recipes'],
+                name='unique_shopping_cart',
+            )
+        ]
 
     def __str__(self):
         return f'{self.user} добавил "{self.recipes}" в свою корзину'
+
+
+class FeedRecipes(models.Model):
+    """ Лента пользователя: рецепты авторов, на которых он подписан.
+
+    Записи добавляются при публикации рецепта и при подписке, поэтому
+    чтение страницы ленты не зависит от числа подписок.
+    """
+    user = models.ForeignKey(
+        User,
+        verbose_name='Пользователь',
+        on_delete=models.CASCADE,
+        related_name='feed',
+    )
+    recipes = models.ForeignKey(
+        Recipes,
+        verbose_name='Рецепт',
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+    )
+    pub_date = models.DateTimeField(verbose_name='Дата публикации рецепта')
+
+    class Meta:
+        ordering = ('-pub_date', '-recipes_id')
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Лента'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'recipes'],
+                name='unique_feed_recipes',
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=('user', '-pub_date', '-recipes'),
+                name='feed_user_pub_date_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.recipes} в ленте {self.user}'
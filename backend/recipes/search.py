@@ -0,0 +1,95 @@
+""" Полнотекстовый поиск рецептов по названию, описанию и ингредиентам.
+
+В Postgres поиск идёт по поддерживаемому полю search_vector с
+GIN-индексом и ранжированием. В SQLite, где LIKE не учитывает регистр
+только для латиницы, каждое слово запроса ищется в строках, приведённых
+к нижнему регистру функцией casefold на стороне Python.
+"""
+
+from django.conf import settings
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import (SearchQuery, SearchRank,
+                                            SearchVector)
+from django.db import connections
+from django.db.models import (Case, CharField, F, Func, IntegerField, OuterRef,
+                              Q, Subquery, Value, When)
+from django.db.models.functions import Coalesce
+
+from .models import IngredientsRecipes, Recipes
+
+
+def is_postgres(queryset):
+    return connections[queryset.db].vendor == 'postgresql'
+
+
+def casefold(value):
+    return None if value is None else str(value).casefold()
+
+
+def register_sqlite_functions(connection):
+    """ Добавляет в соединение SQLite функцию CASEFOLD."""
+    if connection.vendor == 'sqlite':
+        connection.connection.create_function('CASEFOLD', 1, casefold)
+
+
+class CaseFold(Func):
+    function = 'CASEFOLD'
+    output_field = CharField()
+
+
+def search_vector():
+    """ Выражение вектора: название важнее ингредиентов, те — описания."""
+    config = settings.RECIPES_SEARCH_CONFIG
+    ingredient_names = Subquery(
+        IngredientsRecipes.objects
+        .filter(recipes=OuterRef('pk'))
+        .order_by()
+        .values('recipes')
+        .annotate(names=StringAgg('ingredients__name', ' '))
+        .values('names')
+    )
+    return (
+        SearchVector('name', weight='A', config=config)
+        + SearchVector(
+            Coalesce(ingredient_names, Value('')), weight='B', config=config)
+        + SearchVector('text', weight='C', config=config)
+    )
+
+
+def update_search_vectors(queryset=None):
+    """ Пересчитывает search_vector одним UPDATE, вне Postgres — ничего."""
+    if queryset is None:
+        queryset = Recipes.objects.all()
+    if not is_postgres(queryset):
+        return 0
+    return queryset.update(search_vector=search_vector())
+
+
+def search_recipes(queryset, value):
+    """ Рецепты по запросу value, самые подходящие первыми."""
+    if is_postgres(queryset):
+        query = SearchQuery(
+            value, config=settings.RECIPES_SEARCH_CONFIG,
+            search_type='websearch')
+        return queryset.filter(search_vector=query).annotate(
+            search_rank=SearchRank(F('search_vector'), query)
+        ).order_by('-search_rank', '-pub_date', '-id')
+    words = value.casefold().split()
+    queryset = queryset.annotate(
+        folded_name=CaseFold('name'), folded_text=CaseFold('text'))
+    ranks = []
+    for word in words:
+        in_name = Q(folded_name__contains=word)
+        in_ingredients = Q(id__in=IngredientsRecipes.objects.annotate(
+            folded_name=CaseFold('ingredients__name')
+        ).filter(folded_name__contains=word).values('recipes'))
+        queryset = queryset.filter(
+            in_name | in_ingredients | Q(folded_text__contains=word))
+        ranks.append(Case(
+            When(in_name, then=Value(3)),
+            When(in_ingredients, then=Value(2)),
+            default=Value(1),
+            output_field=IntegerField(),
+        ))
+    return queryset.annotate(search_rank=sum(ranks[1:], ranks[0])).order_by(
+        '-search_rank', '-pub_date', '-id')
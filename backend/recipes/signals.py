@@ -0,0 +1,134 @@
+""" Обработчики сигналов приложения recipes."""
+
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+from users.models import Subscriptions, User
+
+from .counters import change_counter
+from .feed import backfill, fan_out, remove_author
+from .images import renditions_up_to_date, schedule_renditions
+from .models import (FavoriteResipes, Ingredients, IngredientsRecipes, Recipes,
+                     ShoppingCart)
+from .search import register_sqlite_functions, update_search_vectors
+
+
+def touch_recipes(recipe_ids):
+    """ Обновляет updated_at, от которого зависит ETag рецепта.
+
+    Нужен при изменении связей рецепта в обход его сохранения:
+    update() и строки промежуточных таблиц не трогают auto_now.
+    """
+    Recipes.objects.filter(pk__in=recipe_ids).update(
+        updated_at=timezone.now())
+
+
+@receiver(connection_created)
+def add_sqlite_functions(sender, connection, **kwargs):
+    register_sqlite_functions(connection)
+
+
+@receiver(post_save, sender=Recipes)
+def create_image_renditions(sender, instance, **kwargs):
+    """ После сохранения рецепта готовит версии нового изображения."""
+    if instance.image and not renditions_up_to_date(instance):
+        transaction.on_commit(lambda: schedule_renditions(instance.pk))
+
+
+@receiver(post_save, sender=Recipes)
+def update_recipe_search_vector(sender, instance, **kwargs):
+    """ Обновляет поисковый вектор, когда ингредиенты уже сохранены."""
+    transaction.on_commit(lambda: update_search_vectors(
+        Recipes.objects.filter(pk=instance.pk)))
+
+
+@receiver(post_save, sender=IngredientsRecipes)
+@receiver(post_delete, sender=IngredientsRecipes)
+def touch_recipe_on_ingredients_change(sender, instance, **kwargs):
+    """ Строку ингредиента можно изменить отдельно, например в админке."""
+    touch_recipes([instance.recipes_id])
+    transaction.on_commit(lambda: update_search_vectors(
+        Recipes.objects.filter(pk=instance.recipes_id)))
+
+
+@receiver(m2m_changed, sender=Recipes.tags.through)
+def touch_recipes_on_tags_change(sender, instance, action, reverse, pk_set,
+                                 **kwargs):
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            touch_recipes([instance.pk])
+    elif action in ('post_add', 'post_remove'):
+        touch_recipes(pk_set)
+    elif action == 'pre_clear':
+        touch_recipes(Recipes.objects.filter(
+            tags=instance).values_list('pk', flat=True))
+
+
+@receiver(post_save, sender=Ingredients)
+def update_ingredient_search_vectors(sender, instance, created, **kwargs):
+    if not created:
+        transaction.on_commit(lambda: update_search_vectors(
+            Recipes.objects.filter(ingredients=instance)))
+
+
+@receiver(post_save, sender=Recipes)
+def increment_recipes_count(sender, instance, created, **kwargs):
+    if created:
+        change_counter(User, instance.author_id, 'recipes_count', 1)
+
+
+@receiver(post_delete, sender=Recipes)
+def decrement_recipes_count(sender, instance, **kwargs):
+    change_counter(User, instance.author_id, 'recipes_count', -1)
+
+
+@receiver(post_save, sender=FavoriteResipes)
+def increment_favorites_count(sender, instance, created, **kwargs):
+    if created:
+        change_counter(Recipes, instance.recipes_id, 'favorites_count', 1)
+
+
+@receiver(post_delete, sender=FavoriteResipes)
+def decrement_favorites_count(sender, instance, **kwargs):
+    change_counter(Recipes, instance.recipes_id, 'favorites_count', -1)
+
+
+@receiver(post_save, sender=ShoppingCart)
+def increment_in_carts_count(sender, instance, created, **kwargs):
+    if created:
+        change_counter(Recipes, instance.recipes_id, 'in_carts_count', 1)
+
+
+@receiver(post_delete, sender=ShoppingCart)
+def decrement_in_carts_count(sender, instance, **kwargs):
+    change_counter(Recipes, instance.recipes_id, 'in_carts_count', -1)
+
+
+@receiver(post_save, sender=Subscriptions)
+def increment_subscribers_count(sender, instance, created, **kwargs):
+    if created:
+        change_counter(User, instance.author_id, 'subscribers_count', 1)
+
+
+@receiver(post_delete, sender=Subscriptions)
+def decrement_subscribers_count(sender, instance, **kwargs):
+    change_counter(User, instance.author_id, 'subscribers_count', -1)
+
+
+@receiver(post_save, sender=Recipes)
+def add_to_feeds(sender, instance, created, **kwargs):
+    if created:
+        fan_out(instance)
+
+
+@receiver(post_save, sender=Subscriptions)
+def backfill_feed(sender, instance, created, **kwargs):
+    if created:
+        backfill(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Subscriptions)
+def clean_feed(sender, instance, **kwargs):
+    remove_author(instance.user_id, instance.author_id)
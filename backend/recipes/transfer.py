@@ -0,0 +1,210 @@
+""" Перенос рецептов между окружениями в формате JSON Lines."""
+
+import base64
+import json
+from itertools import islice
+
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from django.db.models import Prefetch
+from django.utils.dateparse import parse_datetime
+from users.models import User
+
+from .models import Ingredients, IngredientsRecipes, Recipes, Tags
+
+CHUNK_SIZE = 1000
+
+
+def serialize_recipe(recipe, with_images=False):
+    """ Рецепт со связями, где все ссылки заменены естественными ключами."""
+    author = recipe.author
+    data = {
+        'author': {
+            'username': author.username,
+            'email': author.email,
+            'first_name': author.first_name,
+            'last_name': author.last_name,
+        },
+        'name': recipe.name,
+        'text': recipe.text,
+        'cooking_time': recipe.cooking_time,
+        'pub_date': recipe.pub_date.isoformat(),
+        'image': recipe.image.name or None,
+        'tags': [
+            {'slug': tag.slug, 'name': tag.name, 'color': tag.color}
+            for tag in recipe.tags.all()
+        ],
+        'ingredients': [
+            {
+                'name': item.ingredients.name,
+                'measurement_unit': item.ingredients.measurement_unit,
+                'amount': item.amount,
+            }
+            for item in recipe.amount_ingredients.all()
+        ],
+    }
+    if with_images and recipe.image:
+        with recipe.image.open('rb') as file:
+            data['image_data'] = base64.b64encode(file.read()).decode()
+    return data
+
+
+def export_recipes(file, chunk_size=CHUNK_SIZE, with_images=False):
+    """ Пишет рецепты в file по одному JSON-объекту на строку.
+
+    Django 3.2 не выполняет prefetch_related вместе с iterator(),
+    поэтому рецепты читаются кусками по первичному ключу.
+    """
+    queryset = Recipes.objects.select_related('author').prefetch_related(
+        'tags',
+        Prefetch(
+            'amount_ingredients',
+            queryset=IngredientsRecipes.objects.select_related('ingredients')
+        ),
+    ).order_by('pk')
+    total, last_pk = 0, 0
+    while True:
+        chunk = list(queryset.filter(pk__gt=last_pk)[:chunk_size])
+        if not chunk:
+            return total
+        for recipe in chunk:
+            file.write(json.dumps(
+                serialize_recipe(recipe, with_images), ensure_ascii=False))
+            file.write('\n')
+        last_pk = chunk[-1].pk
+        total += len(chunk)
+
+
+class RecipesImporter:
+    """ Загружает рецепты пачками, сопоставляя ключи по словарям в памяти."""
+
+    def __init__(self, batch_size=CHUNK_SIZE):
+        self.batch_size = batch_size
+        self.users = dict(User.objects.values_list('username', 'id'))
+        self.tags = dict(Tags.objects.values_list('slug', 'id'))
+        self.ingredients = {
+            (name, unit): pk for pk, name, unit in
+            Ingredients.objects.values_list('id', 'name', 'measurement_unit')
+        }
+        self.created_catalog = False
+
+    def run(self, lines):
+        total = 0
+        items = (json.loads(line) for line in lines if line.strip())
+        while True:
+            batch = list(islice(items, self.batch_size))
+            if not batch:
+                return total
+            with transaction.atomic():
+                self.import_batch(batch)
+            total += len(batch)
+
+    def import_batch(self, items):
+        self.create_users(items)
+        self.create_tags(items)
+        self.create_ingredients(items)
+        recipes = [
+            Recipes(
+                author_id=self.users[item['author']['username']],
+                name=item['name'],
+                text=item['text'],
+                cooking_time=item['cooking_time'],
+                image=self.save_image(item),
+            )
+            for item in items
+        ]
+        if connection.features.can_return_rows_from_bulk_insert:
+            Recipes.objects.bulk_create(recipes)
+        else:
+            for recipe in recipes:
+                recipe.save()
+        # auto_now_add перезаписывает дату при вставке, возвращаем исходную.
+        for recipe, item in zip(recipes, items):
+            recipe.pub_date = parse_datetime(item['pub_date'])
+        Recipes.objects.bulk_update(recipes, ('pub_date',))
+        tags_through = Recipes.tags.through
+        tags_through.objects.bulk_create(
+            tags_through(recipes_id=recipe.pk, tags_id=self.tags[tag['slug']])
+            for recipe, item in zip(recipes, items)
+            for tag in item['tags']
+        )
+        IngredientsRecipes.objects.bulk_create(
+            IngredientsRecipes(
+                recipes_id=recipe.pk,
+                ingredients_id=self.ingredients[
+                    (ingredient['name'], ingredient['measurement_unit'])],
+                amount=ingredient['amount'],
+            )
+            for recipe, item in zip(recipes, items)
+            for ingredient in item['ingredients']
+        )
+
+    @staticmethod
+    def save_image(item):
+        if item.get('image_data'):
+            return default_storage.save(
+                item['image'] or 'recipes/imported',
+                ContentFile(base64.b64decode(item['image_data'])))
+        return item['image']
+
+    def create_users(self, items):
+        """ Создаёт недостающих авторов.
+
+        Автор, чья почта уже занята пользователем с другим именем,
+        сопоставляется с этим пользователем.
+        """
+        missing = {
+            item['author']['username']: item['author'] for item in items
+            if item['author']['username'] not in self.users
+        }
+        if not missing:
+            return
+        User.objects.bulk_create(
+            (User(password=make_password(None), **author)
+             for author in missing.values()),
+            ignore_conflicts=True,
+        )
+        self.users.update(User.objects.filter(
+            username__in=missing).values_list('username', 'id'))
+        conflicts = {
+            username: author['email'] for username, author in missing.items()
+            if username not in self.users
+        }
+        if conflicts:
+            by_email = dict(User.objects.filter(
+                email__in=conflicts.values()).values_list('email', 'id'))
+            for username, email in conflicts.items():
+                self.users[username] = by_email[email]
+
+    def create_tags(self, items):
+        missing = {
+            tag['slug']: tag for item in items for tag in item['tags']
+            if tag['slug'] not in self.tags
+        }
+        if not missing:
+            return
+        Tags.objects.bulk_create(
+            (Tags(**tag) for tag in missing.values()), ignore_conflicts=True)
+        self.tags.update(Tags.objects.filter(
+            slug__in=missing).values_list('slug', 'id'))
+        self.created_catalog = True
+
+    def create_ingredients(self, items):
+        missing = {
+            (ingredient['name'], ingredient['measurement_unit'])
+            for item in items for ingredient in item['ingredients']
+        } - self.ingredients.keys()
+        if not missing:
+            return
+        Ingredients.objects.bulk_create(
+            (Ingredients(name=name, measurement_unit=unit)
+             for name, unit in missing),
+            ignore_conflicts=True,
+        )
+        names = {name for name, _ in missing}
+        for pk, name, unit in Ingredients.objects.filter(
+                name__in=names).values_list('id', 'name', 'measurement_unit'):
+            self.ingredients[(name, unit)] = pk
+        self.created_catalog = True
@@ -13,6 +13,8 @@ class UserAdmin(admin.ModelAdmin):
         'email',
         'first_name',
         'last_name',
+        'recipes_count',
+        'subscribers_count',
     )
     list_filter = ('email', 'username')
     search_fields = ('email', 'username')
@@ -1,6 +1,7 @@
+from api.relations import get_relations
 from djoser.serializers import UserCreateSerializer, UserSerializer
 from rest_framework import serializers
-from users.models import Subscriptions, User
+from users.models import User
 
 
 class CustomUserCreateSerializer(UserCreateSerializer):
@@ -32,7 +33,6 @@ class CustomUserSerializer(UserSerializer):
             'is_subscribed')
 
     def get_is_subscribed(self, obj):
-        request = self.context.get('request')
-        return Subscriptions.objects.filter(
-                user=request.user.id,
-                author=obj.id).exists() if request else False
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
+        return obj.id in get_relations(self.context).subscribed_authors
@@ -1,7 +1,11 @@
 
+from django.db import IntegrityError, transaction
+from django.db.models import (BooleanField, F, Prefetch, Value, Window,
+                              prefetch_related_objects)
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import RowNumber
 from djoser.views import UserViewSet
 from rest_framework import status
-from rest_framework.decorators import action
 from rest_framework.generics import ListAPIView, get_object_or_404
 from rest_framework.permissions import (IsAuthenticated,
                                         IsAuthenticatedOrReadOnly)
@@ -9,19 +13,21 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 
 from api.pagination import LimitPageNumberPagination
+from api.replicas import ReplicaReadMixin
 from api.serializers import SubscriptionsSerializer
+from recipes.models import Recipes
 from users.models import Subscriptions, User
 from users.serializers import CustomUserSerializer
 
 
-class CustomUserViewSet(UserViewSet):
+class CustomUserViewSet(ReplicaReadMixin, UserViewSet):
     """ Вьюсет пользователей."""
     queryset = User.objects.all()
     serializer_class = CustomUserSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
 
 
-class UsersViewSet(APIView):
+class UsersViewSet(ReplicaReadMixin, APIView):
     """ Вьюсет пользователей."""
     serializer_class = SubscriptionsSerializer
     permission_classes = [IsAuthenticated]
@@ -34,19 +40,18 @@ class UsersViewSet(APIView):
                 {'error': 'Нельзя подписаться на себя'},
                 status=status.HTTP_400_BAD_REQUEST
             )
-        if Subscriptions.objects.filter(
-                user=request.user,
-                author_id=user_id
-        ).exists():
+        author = get_object_or_404(User, id=user_id)
+        try:
+            with transaction.atomic():
+                Subscriptions.objects.create(
+                    user=request.user,
+                    author_id=user_id
+                )
+        except IntegrityError:
             return Response(
                 {'error': 'Вы уже подписаны на пользователя'},
                 status=status.HTTP_400_BAD_REQUEST
             )
-        author = get_object_or_404(User, id=user_id)
-        Subscriptions.objects.create(
-            user=request.user,
-            author_id=user_id
-        )
         return Response(
             self.serializer_class(author, context={'request': request}).data,
             status=status.HTTP_201_CREATED
@@ -67,12 +72,48 @@ class UsersViewSet(APIView):
         )
 
 
-class UsersListView(ListAPIView):
+class UsersListView(ReplicaReadMixin, ListAPIView):
     """ Вьюсет пользователей просмотр."""
     serializer_class = SubscriptionsSerializer
     permission_classes = [IsAuthenticated]
     pagination_class = LimitPageNumberPagination
 
-    @action(detail=False, methods=['GET'], url_path='subscriptions')
     def get_queryset(self):
-        return User.objects.filter(subscribtions__user=self.request.user)
+        return User.objects.filter(
+            subscribtions__user=self.request.user
+        ).annotate(
+            is_subscribed=Value(True, output_field=BooleanField()),
+        )
+
+    def paginate_queryset(self, queryset):
+        """ Подгружает последние рецепты авторов страницы одним запросом."""
+        authors = super().paginate_queryset(queryset)
+        if authors is not None:
+            prefetch_related_objects(authors, Prefetch(
+                'recipes',
+                queryset=self.get_recipes_queryset(authors),
+                to_attr='latest_recipes'
+            ))
+        return authors
+
+    def get_recipes_queryset(self, authors):
+        """ Не более recipes_limit последних рецептов каждого автора.
+
+        Номер рецепта внутри автора считает ROW_NUMBER() OVER
+        (PARTITION BY author), поэтому лимит применяется в базе.
+        """
+        recipes = Recipes.objects.filter(author__in=authors)
+        try:
+            limit = int(self.request.query_params['recipes_limit'])
+        except (KeyError, ValueError):
+            return recipes
+        ranked = recipes.annotate(recipe_number=Window(
+            expression=RowNumber(),
+            partition_by=F('author_id'),
+            order_by=(F('pub_date').desc(), F('id').desc()),
+        )).values('id', 'recipe_number')
+        sql, params = ranked.query.sql_with_params()
+        return Recipes.objects.filter(id__in=RawSQL(
+            f'SELECT id FROM ({sql}) AS ranked WHERE recipe_number <= %s',
+            (*params, max(limit, 0))
+        ))